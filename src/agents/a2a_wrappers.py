@@ -226,15 +226,16 @@ You will execute forecasting by coordinating with PatientAnalysisAgent and Exter
 
         self.logger.info(f"Running forecast for {forecast_days} days from {target_date}")
 
-        # Stage 1: Patient profiling
-        patient_result = self.profiling_agent.execute(
-            self.prescription_data,
-            analysis_date=target_date
+        # Stages 1-2: Patient profiling and external signals are independent
+        patient_result, external_signals = await asyncio.gather(
+            asyncio.to_thread(
+                self.profiling_agent.execute,
+                self.prescription_data,
+                analysis_date=target_date
+            ),
+            asyncio.to_thread(self.external_agent.execute, target_date=target_date)
         )
 
-        # Stage 2: External signals
-        external_signals = self.external_agent.execute(target_date=target_date)
-
         # Stage 3: Forecasting
         forecast_config = ForecastingConfig(
             forecast_horizon_days=forecast_days,
@@ -426,21 +427,46 @@ This is the most comprehensive analysis - use when user wants order recommendati
             description="Runs full pipeline and generates optimal inventory order recommendations"
         )
 
-    async def execute_async(self, analysis_date: Optional[date] = None) -> str:
-        """Execute complete pipeline asynchronously"""
+    async def execute_async(self, analysis_date: Optional[date] = None,
+                            medication_filter: Optional[str] = None) -> str:
+        """
+        Execute complete pipeline asynchronously.
+
+        Args:
+            analysis_date: Analysis date (defaults to today)
+            medication_filter: Optional name prefix (e.g. "metformin"); restricts
+                profiling, forecasting and optimization to matching medications
+        """
         analysis_date = analysis_date or date.today()
 
         self.logger.info(f"Running complete pipeline for {analysis_date}")
 
-        # Stage 1: Patient Profiling
-        patient_result = self.profiling_agent.execute(
-            self.prescription_data,
-            analysis_date=analysis_date
+        prescription_data = self.prescription_data
+        inventory_data = self.inventory_data
+        medication_db = self.medication_db
+        if medication_filter:
+            prefix = medication_filter.lower()
+            prescription_data = prescription_data[
+                prescription_data['medication'].str.lower().str.startswith(prefix)
+            ]
+            inventory_data = inventory_data[
+                inventory_data['medication'].str.lower().str.startswith(prefix)
+            ]
+            medication_db = medication_db[
+                medication_db['medication'].str.lower().str.startswith(prefix)
+            ]
+            self.logger.info(f"  Scoped to medications matching '{medication_filter}'")
+
+        # Stages 1-2: Patient Profiling and External Signals are independent
+        patient_result, external_signals = await asyncio.gather(
+            asyncio.to_thread(
+                self.profiling_agent.execute,
+                prescription_data,
+                analysis_date=analysis_date
+            ),
+            asyncio.to_thread(self.external_agent.execute, target_date=analysis_date)
         )
 
-        # Stage 2: External Signals
-        external_signals = self.external_agent.execute(target_date=analysis_date)
-
         # Stage 3: Forecasting
         forecast_config = ForecastingConfig(
             forecast_horizon_days=30,
@@ -452,8 +478,8 @@ This is the most comprehensive analysis - use when user wants order recommendati
         forecast_result = forecasting_agent.execute(
             patient_profiles=patient_result,
             external_signals=external_signals,
-            historical_data=self.prescription_data,
-            start_date=target_date
+            historical_data=prescription_data,
+            start_date=analysis_date
         )
 
         # Stage 4: Optimization
@@ -467,8 +493,8 @@ This is the most comprehensive analysis - use when user wants order recommendati
         optimization_agent = OptimizationAgent(config=optimization_config)
         optimization_result = optimization_agent.execute(
             forecast=forecast_result,
-            inventory_data=self.inventory_data,
-            medication_db=self.medication_db
+            inventory_data=inventory_data,
+            medication_db=medication_db
         )
 
         # Format summary as natural language
@@ -476,6 +502,8 @@ This is the most comprehensive analysis - use when user wants order recommendati
 
         response = f"## 📊 Complete Inventory Analysis\n\n"
         response += f"**Analysis Date:** {analysis_date}\n\n"
+        if medication_filter:
+            response += f"**Scope:** {medication_filter.title()} (all variants)\n\n"
 
         # Patient Analysis
         response += f"### 👥 Patient Analysis\n"
@@ -516,6 +544,7 @@ This is the most comprehensive analysis - use when user wants order recommendati
 
         return response
 
-    def execute(self, analysis_date: Optional[date] = None) -> str:
+    def execute(self, analysis_date: Optional[date] = None,
+                medication_filter: Optional[str] = None) -> str:
         """Synchronous execution wrapper"""
-        return asyncio.run(self.execute_async(analysis_date))
+        return asyncio.run(self.execute_async(analysis_date, medication_filter))
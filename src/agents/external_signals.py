@@ -25,7 +25,7 @@ from src.schemas.external_signals import (
     TrendDirection
 )
 from src.services.eody_reports import EODYReportsService
-from src.services.weather_api import WeatherAPI
+from src.services.weather_api import get_weather_client
 
 from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional
@@ -88,7 +88,7 @@ class ExternalSignalsAgent:
         
         # Initialize services
         self.eody_service = EODYReportsService()
-        self.weather_api = WeatherAPI(location=location)
+        self.weather_api = get_weather_client(location, cache_dir=".cache/weather")
         
         # Initialize holiday calendar
         holiday_class = self.HOLIDAY_COUNTRIES.get(
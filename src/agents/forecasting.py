@@ -28,6 +28,10 @@ import warnings
 
 warnings.filterwarnings('ignore', category=FutureWarning)
 
+# Shared alert sets for the per-day forecast records
+_SPIKE_ALERTS = frozenset({DemandAlert.SPIKE})
+_NO_ALERTS = frozenset()
+
 
 class ForecastingAgent:
     """
@@ -241,58 +245,59 @@ class ForecastingAgent:
         # Get external multiplier for this category
         external_multiplier = multipliers.get(category, 1.0)
 
-        # Generate forecast for each day in the range
-        current_date = start_date
-
-        while current_date <= end_date:
-            # Patient-based demand for this date
-            patient_based = patient_demand.get(current_date, 0.0)
-
-            # Calculate base demand (could use Prophet here with historical data)
-            if self.config.use_prophet and historical_data is not None:
-                # TODO: Implement Prophet forecasting with historical data
-                # For now, use simple average
-                base_demand = patient_based
-            else:
-                base_demand = patient_based
-
-            # Apply external multiplier
-            predicted_demand = base_demand * external_multiplier
-
-            # Calculate confidence bounds (95% interval)
-            # Lower confidence if relying only on patient predictions
-            if patient_based > 0:
-                confidence = 0.85
-                std_dev = predicted_demand * 0.15
-            else:
-                confidence = 0.60
-                std_dev = predicted_demand * 0.30
-
-            lower_bound = max(0, predicted_demand - 1.96 * std_dev)
-            upper_bound = predicted_demand + 1.96 * std_dev
-
-            # Detect alerts
-            alerts = []
-            if predicted_demand > base_demand * self.config.spike_threshold:
-                alerts.append(DemandAlert.SPIKE)
-
-            forecast = MedicationForecast(
+        # Daily dates in the range
+        n_days = (end_date - start_date).days + 1
+        dates = [start_date + timedelta(days=i) for i in range(n_days)]
+
+        # Patient-based demand per date
+        patient_based = np.array([patient_demand.get(d, 0.0) for d in dates], dtype=float)
+
+        # Calculate base demand (could use Prophet here with historical data)
+        # TODO: Implement Prophet forecasting with historical data
+        # For now, use patient-based demand in both modes
+        base_demand = patient_based
+
+        # Apply external multiplier to the whole horizon at once
+        predicted_demand = base_demand * external_multiplier
+
+        # Calculate confidence bounds (95% interval)
+        # Lower confidence if relying only on patient predictions
+        has_patient_demand = patient_based > 0
+        confidence = np.where(has_patient_demand, 0.85, 0.60)
+        std_dev = predicted_demand * np.where(has_patient_demand, 0.15, 0.30)
+
+        lower_bound = np.maximum(0, predicted_demand - 1.96 * std_dev)
+        upper_bound = predicted_demand + 1.96 * std_dev
+
+        # Detect alerts
+        is_spike = predicted_demand > base_demand * self.config.spike_threshold
+
+        method = ForecastMethod.HYBRID if self.config.use_prophet else ForecastMethod.PATIENT_BASED
+
+        for current_date, predicted, lower, upper, base, patient, conf, spike in zip(
+            dates,
+            predicted_demand.tolist(),
+            lower_bound.tolist(),
+            upper_bound.tolist(),
+            base_demand.tolist(),
+            patient_based.tolist(),
+            confidence.tolist(),
+            is_spike.tolist()
+        ):
+            forecasts.append(MedicationForecast.build_trusted(
                 medication=medication,
                 category=category,
                 forecast_date=current_date,
-                predicted_demand=predicted_demand,
-                lower_bound=lower_bound,
-                upper_bound=upper_bound,
-                base_demand=base_demand,
-                patient_based_demand=patient_based,
+                predicted_demand=predicted,
+                lower_bound=lower,
+                upper_bound=upper,
+                base_demand=base,
+                patient_based_demand=patient,
                 external_multiplier=external_multiplier,
-                confidence=confidence,
-                method=ForecastMethod.HYBRID if self.config.use_prophet else ForecastMethod.PATIENT_BASED,
-                alerts=alerts
-            )
-
-            forecasts.append(forecast)
-            current_date += timedelta(days=1)
+                confidence=conf,
+                method=method,
+                alerts=_SPIKE_ALERTS if spike else _NO_ALERTS
+            ))
 
         return forecasts
 
@@ -334,7 +334,7 @@ class OptimizationAgent:
                 order_cost=order_cost,
                 days_of_supply=days_of_supply_after_order,
                 priority=priority,
-                reasons=reasons,
+                reasons=frozenset(reasons),
                 urgency_score=urgency_score,
                 stockout_risk=stockout_risk,
                 overstock_risk=overstock_risk,
@@ -358,8 +358,13 @@ class OptimizationAgent:
         critical_orders = sum(1 for o in order_recommendations if o.priority == OrderPriority.CRITICAL)
         high_priority_orders = sum(1 for o in order_recommendations if o.priority == OrderPriority.HIGH)
 
+        # Column arrays for the numeric reductions below
+        n_orders = len(order_recommendations)
+        costs = np.fromiter((o.order_cost for o in order_recommendations), dtype=np.float64, count=n_orders)
+        risks = np.fromiter((o.stockout_risk for o in order_recommendations), dtype=np.float64, count=n_orders)
+
         # Total costs
-        total_order_cost = sum(o.order_cost for o in order_recommendations)
+        total_order_cost = float(costs.sum())
 
         # Current inventory value
         total_current_value = sum(
@@ -371,11 +376,13 @@ class OptimizationAgent:
         estimated_carrying_cost = total_current_value * (self.config.carrying_cost_rate / 12)
 
         # Risk metrics
-        medications_at_risk = sum(1 for o in order_recommendations if o.stockout_risk > 0.5)
-        avg_stockout_risk = np.mean([o.stockout_risk for o in order_recommendations]) if order_recommendations else 0.0
+        medications_at_risk = int(np.count_nonzero(risks > 0.5))
+        avg_stockout_risk = float(risks.mean()) if n_orders else 0.0
 
         # Total forecasted demand
-        total_forecasted_demand = sum(demand_by_medication.values())
+        total_forecasted_demand = float(np.fromiter(
+            demand_by_medication.values(), dtype=np.float64, count=len(demand_by_medication)
+        ).sum())
 
         return OptimizationSummary(
             optimization_date=date.today(),
@@ -238,7 +238,7 @@ Extract the flu data as JSON following the specified format."""
 
         # Validate and create FluDataExtraction
         try:
-            flu_data = FluDataExtraction(**data)
+            flu_data = FluDataExtraction.from_untrusted(data)
             return flu_data
         except Exception as e:
             self.logger.error(f"Failed to create FluDataExtraction: {e}")
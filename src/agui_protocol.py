@@ -5,10 +5,12 @@ Agent-User Interface (AG-UI) protocol for transparent, step-by-step interactions
 Provides status updates, result messages, and suggested next actions.
 """
 
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from enum import Enum
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 import json
 
 
@@ -168,6 +170,8 @@ class AGUIMessageHandler:
         self.status_updates: List[StatusUpdate] = []
         self.results: List[ResultMessage] = []
         self.callbacks: List[Callable] = []
+        self._batch_depth = 0
+        self._pending: List[Any] = []
 
     def register_callback(self, callback: Callable[[Any], None]):
         """Register a callback to receive messages in real-time"""
@@ -183,10 +187,30 @@ class AGUIMessageHandler:
         elif isinstance(message, ResultMessage):
             self.results.append(message)
 
-        # Call callbacks if streaming enabled
+        # Call callbacks if streaming enabled (deferred while batching)
         if self.enable_streaming:
-            for callback in self.callbacks:
-                callback(message)
+            if self._batch_depth:
+                self._pending.append(message)
+            else:
+                for callback in self.callbacks:
+                    callback(message)
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer streamed messages and deliver them to callbacks in one flush
+        when the outermost batch exits. Messages are still recorded immediately.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._pending:
+                pending, self._pending = self._pending, []
+                for callback in self.callbacks:
+                    for message in pending:
+                        callback(message)
 
     def status(self, agent: str, message: str, status: AgentStatus = AgentStatus.WORKING):
         """Emit a status update"""
@@ -219,7 +243,7 @@ class AGUIMessageHandler:
         final = FinalResponse(
             query=query,
             summary=summary,
-            results=self.results,
+            results=list(self.results),
             suggestions=suggestions,
             execution_time_seconds=execution_time
         )
@@ -240,29 +264,45 @@ class AGUIMessageHandler:
 class SuggestionGenerator:
     """
     Generates contextual follow-up suggestions based on results.
+
+    Suggestions depend only on a few scalar fields of each result, so they are
+    memoized on those fields; callers get fresh copies each time, so mutating
+    a returned action (or its context) never leaks into the cache.
     """
 
+    @staticmethod
+    def _copies(actions: Tuple[SuggestedAction, ...]) -> List[SuggestedAction]:
+        return [replace(a, context=dict(a.context)) for a in actions]
+
     @staticmethod
     def generate_for_patient_analysis(result: Dict[str, Any]) -> List[SuggestedAction]:
         """Generate suggestions after patient analysis"""
+        return SuggestionGenerator._copies(SuggestionGenerator._patient_analysis(
+            result.get("high_risk_patients", 0),
+            result.get("due_soon_7_days", 0)
+        ))
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _patient_analysis(high_risk_patients: int, due_soon_7_days: int) -> Tuple[SuggestedAction, ...]:
         suggestions = []
 
         # If high-risk patients found
-        if result.get("high_risk_patients", 0) > 0:
+        if high_risk_patients > 0:
             suggestions.append(SuggestedAction(
                 id="contact_high_risk",
                 label="Contact high-risk patients for refill reminders",
-                description=f"Send automated refill reminders to {result['high_risk_patients']} high-risk patients to prevent medication lapses",
+                description=f"Send automated refill reminders to {high_risk_patients} high-risk patients to prevent medication lapses",
                 agent_target="PatientAnalysisAgent",
                 context={"filter": "high_risk"}
             ))
 
         # If many patients due soon
-        if result.get("due_soon_7_days", 0) > 50:
+        if due_soon_7_days > 50:
             suggestions.append(SuggestedAction(
                 id="forecast_demand",
                 label="Forecast demand for upcoming week",
-                description=f"Run demand forecast for the {result['due_soon_7_days']} patients due for refills this week",
+                description=f"Run demand forecast for the {due_soon_7_days} patients due for refills this week",
                 agent_target="ForecastingAgent",
                 context={"horizon_days": 7}
             ))
@@ -276,15 +316,24 @@ class SuggestionGenerator:
             context={"detail_level": "full"}
         ))
 
-        return suggestions[:3]  # Max 3 suggestions
+        return tuple(suggestions[:3])  # Max 3 suggestions
 
     @staticmethod
     def generate_for_forecast(result: Dict[str, Any]) -> List[SuggestedAction]:
         """Generate suggestions after forecasting"""
+        return SuggestionGenerator._copies(SuggestionGenerator._forecast(
+            result.get("total_demand", 0) > 10000,
+            bool(result.get("category")),
+            result.get("flu_multiplier", 1.0) > 1.3
+        ))
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _forecast(high_demand: bool, has_category: bool, high_flu: bool) -> Tuple[SuggestedAction, ...]:
         suggestions = []
 
         # If high demand forecasted
-        if result.get("total_demand", 0) > 10000:
+        if high_demand:
             suggestions.append(SuggestedAction(
                 id="optimize_orders",
                 label="Generate optimal order recommendations",
@@ -294,7 +343,7 @@ class SuggestionGenerator:
             ))
 
         # If specific category was forecasted
-        if result.get("category"):
+        if has_category:
             suggestions.append(SuggestedAction(
                 id="compare_categories",
                 label="Compare with other medication categories",
@@ -304,7 +353,7 @@ class SuggestionGenerator:
             ))
 
         # If flu multiplier is high
-        if result.get("flu_multiplier", 1.0) > 1.3:
+        if high_flu:
             suggestions.append(SuggestedAction(
                 id="flu_impact_report",
                 label="Generate flu season impact report",
@@ -313,27 +362,35 @@ class SuggestionGenerator:
                 context={"focus": "flu_impact"}
             ))
 
-        return suggestions[:3]
+        return tuple(suggestions[:3])
 
     @staticmethod
     def generate_for_complete_analysis(result: Dict[str, Any]) -> List[SuggestedAction]:
         """Generate suggestions after complete analysis"""
-        suggestions = []
-
         opt = result.get("optimization", {})
 
+        return SuggestionGenerator._copies(SuggestionGenerator._complete_analysis(
+            opt.get("critical_orders", 0),
+            opt.get("total_recommendations", 0) == 0
+        ))
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _complete_analysis(critical_orders: int, no_recommendations: bool) -> Tuple[SuggestedAction, ...]:
+        suggestions = []
+
         # If critical orders exist
-        if opt.get("critical_orders", 0) > 0:
+        if critical_orders > 0:
             suggestions.append(SuggestedAction(
                 id="supply_chain_risk",
                 label="Generate supply chain risk report",
-                description=f"Analyze risks and alternatives for {opt['critical_orders']} critical medications",
+                description=f"Analyze risks and alternatives for {critical_orders} critical medications",
                 agent_target="CompleteAnalysisAgent",
                 context={"focus": "supply_chain_risk"}
             ))
 
         # If no orders needed
-        if opt.get("total_recommendations", 0) == 0:
+        if no_recommendations:
             suggestions.append(SuggestedAction(
                 id="adjust_thresholds",
                 label="Adjust reorder thresholds",
@@ -351,11 +408,16 @@ class SuggestionGenerator:
             context={"detail_level": "category_breakdown"}
         ))
 
-        return suggestions[:3]
+        return tuple(suggestions[:3])
 
     @staticmethod
     def generate_for_inventory_query(medication: str = None, category: str = None) -> List[SuggestedAction]:
         """Generate suggestions after inventory query"""
+        return SuggestionGenerator._copies(SuggestionGenerator._inventory_query(medication, category))
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _inventory_query(medication: Optional[str], category: Optional[str]) -> Tuple[SuggestedAction, ...]:
         suggestions = []
 
         if medication:
@@ -385,7 +447,7 @@ class SuggestionGenerator:
                 context={"category": category}
             ))
 
-        return suggestions[:3]
+        return tuple(suggestions[:3])
 
 
 # ============================================================================
@@ -6,13 +6,23 @@ Routes user requests to appropriate agents via A2A messaging.
 """
 
 import os
+import re
+import json
 import asyncio
 import time
+import calendar
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from contextlib import nullcontext
+from contextvars import ContextVar
 from pathlib import Path
-from datetime import date
-from typing import Optional, Dict, Any
+from datetime import date, datetime
+from typing import Optional, Dict, Any, List, Literal
 import pandas as pd
-import json
+import orjson
+from functools import cached_property, singledispatch
 
 # Apply nest_asyncio to allow nested event loops (required for Streamlit)
 import nest_asyncio
@@ -23,6 +33,7 @@ from google.adk.runners import InMemoryRunner
 from dotenv import load_dotenv
 
 from src.utils.logging import setup_logger
+from src.services.eody_reports import EODYReportsService
 from src.agents.a2a_wrappers import (
     PatientAnalysisA2AAgent,
     ForecastingA2AAgent,
@@ -39,6 +50,317 @@ from src.agui_protocol import (
 # Load environment variables
 load_dotenv()
 
+# Query patterns used on the direct-query and ranking paths
+_RANK_NUM_RE = re.compile(r'(?:top|bottom)[-\s]*(\d+)')
+_ASC_RE = re.compile(r'\b(least|fewest|lowest|bottom)\b')
+_PATIENT_ID_RE = re.compile(r'\bpatient\s+([A-Za-z0-9_-]+)', re.IGNORECASE)
+_THRESHOLD_RE = re.compile(r'(?:below|under|less than)\s+(\d+)')
+# "Check X inventory, if below N, then forecast/order" style requests
+_CONDITIONAL_RE = re.compile(r'(?=.*\bif\b)(?=.*inventory)(?=.*(?:forecast|order))', re.DOTALL)
+# AG-UI status messages for the conditional-query branch
+_MSG_INV_CHECK = "Checking {med} inventory levels..."
+_MSG_PIPELINE_START = "Running patient analysis and external signals collection..."
+_MSG_MED_FORECAST = "Forecasting {med} demand for next 30 days..."
+
+# Agent routing keywords, matched against prompt tokens (inflections listed explicitly)
+_PATIENT_KWS = frozenset({
+    "analyze", "analyzes", "analyzed", "analyzing",
+    "patient", "patients", "refill", "refills", "refilled", "refilling",
+    "behavior", "behaviors", "behavioral",
+})
+_FORECAST_KWS = frozenset({
+    "forecast", "forecasts", "forecasted", "forecasting",
+    "predict", "predicts", "predicted", "predicting", "prediction", "predictions",
+    "demand", "demands",
+})
+_ORDER_KWS = frozenset({"order", "orders", "ordered", "ordering", "reorder", "reorders", "reordering"})
+_NUMBER_RE = re.compile(r'(\d+[,\d]*)')
+_MONTH_YEAR_RE = re.compile(
+    r'(january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{4})'
+)
+_DAYS_RE = re.compile(r'(?:next\s+)?(\d+)\s+days?')
+_MED_RE = re.compile(r'\b(medicine|medicines|medication|medications|drug|drugs|bought|purchased|ordered)\b')
+
+# Intent vocabulary for the direct-query path. Single words are matched against
+# the prompt's token set (inflected forms listed explicitly); multi-word phrases
+# are matched as substrings.
+_TOKEN_RE = re.compile(r'[a-z0-9_]+')
+# Intent tokens are letter runs only, so "top5" still yields "top"
+_INTENT_TOKEN_RE = re.compile(r'[a-z]+')
+
+_INTENT_WORDS = {
+    # Patient history
+    "patient": ("PATIENT", "CUSTOMER", "DATA_QUERY"),
+    "patients": ("CUSTOMER", "DATA_QUERY"),
+    "medicines": ("PATIENT_DETAIL",),
+    "medications": ("PATIENT_DETAIL", "DATA_QUERY"),
+    "taken": ("PATIENT_DETAIL",),
+    "prescriptions": ("PATIENT_DETAIL",),
+    # Inventory
+    "inventory": ("INVENTORY", "STOCK"),
+    "inventories": ("INVENTORY", "STOCK"),
+    "stock": ("INVENTORY", "STOCK"),
+    "stocks": ("INVENTORY", "STOCK"),
+    "stocked": ("INVENTORY", "STOCK"),
+    "stocking": ("INVENTORY", "STOCK"),
+    "restock": ("INVENTORY", "STOCK"),
+    "restocks": ("INVENTORY", "STOCK"),
+    "restocked": ("INVENTORY", "STOCK"),
+    "restocking": ("INVENTORY", "STOCK"),
+    "overstock": ("INVENTORY", "STOCK"),
+    "overstocked": ("INVENTORY", "STOCK"),
+    "understock": ("INVENTORY", "STOCK"),
+    "understocked": ("INVENTORY", "STOCK"),
+    "supply": ("INVENTORY",),
+    "supplies": ("INVENTORY",),
+    "below": ("LOW_STOCK",),
+    "under": ("LOW_STOCK",),
+    # Top/bottom customers
+    "top": ("TOP", "DATA_QUERY"),
+    "bottom": ("TOP", "ASCENDING", "DATA_QUERY"),
+    "customer": ("CUSTOMER", "DATA_QUERY"),
+    "customers": ("CUSTOMER", "DATA_QUERY"),
+    "least": ("ASCENDING",),
+    "fewest": ("ASCENDING",),
+    "lowest": ("ASCENDING",),
+    "date": ("DATES",),
+    "dates": ("DATES",),
+    "when": ("DATES",),
+    # Requests that need the agent pipeline rather than the LLM data query
+    "forecast": ("FORECAST", "SKIP"),
+    "forecasts": ("FORECAST", "SKIP"),
+    "forecasted": ("FORECAST", "SKIP"),
+    "forecasting": ("FORECAST", "SKIP"),
+    "predict": ("SKIP",),
+    "predicts": ("SKIP",),
+    "predicted": ("SKIP",),
+    "predicting": ("SKIP",),
+    "prediction": ("SKIP",),
+    "predictions": ("SKIP",),
+    "analyze": ("SKIP",),
+    "analyzes": ("SKIP",),
+    "analyzed": ("SKIP",),
+    "analyzing": ("SKIP",),
+    "analysis": ("SKIP",),
+    "analyses": ("SKIP",),
+    "optimize": ("SKIP",),
+    "optimizes": ("SKIP",),
+    "optimized": ("SKIP",),
+    "optimizing": ("SKIP",),
+    "optimization": ("SKIP",),
+    "optimizations": ("SKIP",),
+    # Generic data-query vocabulary
+    "list": ("DATA_QUERY",),
+    "show": ("DATA_QUERY",),
+    "display": ("DATA_QUERY",),
+    "which": ("DATA_QUERY",),
+    "who": ("DATA_QUERY",),
+    "what": ("DATA_QUERY",),
+    "medication": ("DATA_QUERY",),
+}
+
+_INTENT_PHRASES = {
+    "patient history": ("PATIENT_PHRASE",),
+    "prescription history": ("PATIENT_PHRASE",),
+    "medicines has patient": ("PATIENT_PHRASE",),
+    "medications has patient": ("PATIENT_PHRASE",),
+    "what has patient": ("PATIENT_PHRASE",),
+    "low stock": ("LOW_STOCK",),
+    "running low": ("LOW_STOCK",),
+    "less than": ("LOW_STOCK",),
+    "most orders": ("ORDER_RANK",),
+    "most prescriptions": ("ORDER_RANK",),
+    "most refills": ("ORDER_RANK",),
+    "highest orders": ("ORDER_RANK",),
+    "highest prescriptions": ("ORDER_RANK",),
+    "least orders": ("ORDER_RANK",),
+    "least prescriptions": ("ORDER_RANK",),
+    "fewest orders": ("ORDER_RANK",),
+    "fewest prescriptions": ("ORDER_RANK",),
+    "lowest orders": ("ORDER_RANK",),
+    "lowest prescriptions": ("ORDER_RANK",),
+    "tell me about": ("MED_INFO",),
+    "information about": ("MED_INFO",),
+    "list categories": ("LIST_CATEGORIES",),
+    "what categories": ("LIST_CATEGORIES",),
+    "refill pattern": ("SKIP",),
+    "order recommendation": ("SKIP",),
+    "how many": ("DATA_QUERY",),
+}
+
+# Zero-width lookahead so overlapping phrases ("running low stock") all match
+_INTENT_PHRASE_RE = re.compile(
+    '(?=(' + '|'.join(re.escape(phrase) for phrase in _INTENT_PHRASES) + '))'
+)
+
+
+def _scan_intents(text: str) -> set:
+    """Return every intent tag raised by words or phrases in lowercased text"""
+    tags = set()
+    for token in set(_INTENT_TOKEN_RE.findall(text)):
+        tags.update(_INTENT_WORDS.get(token, ()))
+    for match in _INTENT_PHRASE_RE.finditer(text):
+        tags.update(_INTENT_PHRASES[match.group(1)])
+    return tags
+
+
+def _direct_query_routes(tags: set) -> set:
+    """Map intent tags to the direct-query handlers that should be tried"""
+    routes = set()
+
+    # Patient history, unless the query also asks for inventory (multi-step → LLM agent)
+    if ("PATIENT_PHRASE" in tags or "PATIENT_DETAIL" in tags) and "PATIENT" in tags and "STOCK" not in tags:
+        routes.add("PATIENT_HISTORY")
+
+    # Inventory by medication, threshold or category
+    if ("INVENTORY" in tags and "FORECAST" not in tags) or "LOW_STOCK" in tags:
+        routes.update(("INVENTORY_MATCH", "INVENTORY_THRESHOLD", "INVENTORY_CATEGORY"))
+
+    # Top/bottom customers by order count
+    if "TOP" in tags and "CUSTOMER" in tags and "ORDER_RANK" in tags:
+        routes.add("TOP_CUSTOMERS")
+
+    if "MED_INFO" in tags:
+        routes.add("MED_INFO")
+
+    if "LIST_CATEGORIES" in tags:
+        routes.add("LIST_CATEGORIES")
+
+    # Generic data questions go to the LLM query agent unless they need forecasting/analysis
+    if "DATA_QUERY" in tags and "SKIP" not in tags:
+        routes.add("LLM_DATA_QUERY")
+
+    return routes
+
+
+def _alternation(names) -> re.Pattern:
+    """Compile names into one regex; longest first so a longer name wins at the same position"""
+    return re.compile('|'.join(re.escape(name) for name in sorted(set(names), key=len, reverse=True)))
+
+
+def _dumps(obj: Any, indent: bool = True) -> str:
+    """Serialize tool output to a JSON string (indented unless indent=False)"""
+    if indent:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2).decode()
+    # Compact payloads keep json.dumps' ", " / ": " separators; orjson only normalizes numpy values
+    return json.dumps(orjson.loads(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)))
+
+
+_MISSING = object()
+
+
+@singledispatch
+def _extract_response_text(response) -> str:
+    """Extract text from an ADK response (dispatches on type; objects expose .text)"""
+    text = getattr(response, 'text', _MISSING)
+    return str(response) if text is _MISSING else text
+
+
+@_extract_response_text.register
+def _(response: str) -> str:
+    return response
+
+
+@_extract_response_text.register
+def _(response: dict) -> str:
+    return response['text'] if 'text' in response else str(response)
+
+
+@dataclass(slots=True)
+class AgentResult:
+    """Routed agent output; kind is set where the text is produced, so it is never re-parsed"""
+    kind: Literal['json', 'markdown']
+    text: str
+    data: Optional[Dict[str, Any]] = None
+
+
+# ============================================================================
+# AGENT RESULT CACHE - Reuse sub-agent output for identical arguments
+# ============================================================================
+
+# Files under the data directory that the sub-agents read
+_AGENT_INPUT_FILES = (
+    "patients/prescription_history.csv",
+    "inventory/current_stock.csv",
+    "medications/medication_database.csv",
+)
+
+# Prefixes of sub-agent output that reports a failure rather than a result
+_AGENT_ERROR_PREFIXES = ("Error", "❌")
+
+
+class _AgentCache:
+    """
+    Thread-safe LRU cache of sub-agent results with per-entry TTL.
+    Entries are keyed by agent, call arguments, the current date and the
+    weather hour, and are dropped when an agent input file or the set of
+    processed EODY reports changes. Only successful results are stored.
+    """
+
+    def __init__(self, data_dir: Path, maxsize: int = 32, ttl: float = 3600.0):
+        self.data_dir = data_dir
+        self.input_files = tuple(data_dir / name for name in _AGENT_INPUT_FILES)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._reports = EODYReportsService()
+        self._entries: OrderedDict = OrderedDict()
+        self._stamp = self._data_stamp()
+        self._lock = threading.Lock()
+
+    def _data_stamp(self) -> tuple:
+        """Modification times of the agents' input files and the EODY report signature"""
+        mtimes = []
+        for path in self.input_files:
+            try:
+                mtimes.append(path.stat().st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes), self._reports.source_signature()
+
+    @staticmethod
+    def _is_cacheable(result) -> bool:
+        """Whether a sub-agent result is a successful answer worth reusing"""
+        return isinstance(result, str) and bool(result.strip()) and \
+            not result.lstrip().startswith(_AGENT_ERROR_PREFIXES)
+
+    def get_or_compute(self, agent_type: str, fn, ttl: Optional[float] = None, **kwargs) -> str:
+        """Return the cached result for (agent_type, kwargs), computing it on a miss"""
+        # Agents default their dates to today, so results are only reused within a
+        # day; external signals read the weather per wall-clock hour (same bucket
+        # as the weather client), so a new hour is a new key
+        key = (agent_type, tuple(sorted(kwargs.items())), date.today(), int(time.time() // 3600))
+        now = time.monotonic()
+
+        with self._lock:
+            stamp = self._data_stamp()
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._stamp = stamp
+
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        # Compute outside the lock so other agents are not blocked; exceptions
+        # propagate uncached
+        result = fn()
+        if not self._is_cacheable(result):
+            return result
+
+        with self._lock:
+            self._entries[key] = (now + (self.ttl if ttl is None else ttl), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return result
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+
 
 # ============================================================================
 # DATA QUERY TOOLS - For orchestrator to use directly
@@ -55,15 +377,220 @@ class DataQueryTools:
     def _load_data(self):
         """Load all data files into memory"""
         self.logger.info("Loading data files...")
+        self._invalidate_caches()
+
+        # The three files are independent; read them concurrently
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            rx_future = executor.submit(pd.read_csv, self.data_dir / "patients/prescription_history.csv")
+            inv_future = executor.submit(pd.read_csv, self.data_dir / "inventory/current_stock.csv")
+            med_future = executor.submit(pd.read_csv, self.data_dir / "medications/medication_database.csv")
 
-        self.prescription_data = pd.read_csv(self.data_dir / "patients/prescription_history.csv")
-        self.inventory_data = pd.read_csv(self.data_dir / "inventory/current_stock.csv")
-        self.medication_db = pd.read_csv(self.data_dir / "medications/medication_database.csv")
+            self.prescription_data = rx_future.result()
+            self.inventory_data = inv_future.result()
+            self.medication_db = med_future.result()
 
         self.logger.info(f"  ✓ Prescriptions: {len(self.prescription_data):,} records")
         self.logger.info(f"  ✓ Inventory: {len(self.inventory_data):,} lot entries")
         self.logger.info(f"  ✓ Medication DB: {len(self.medication_db):,} medications")
 
+        # Medication DB rows keyed by name for O(1) existence/attribute lookups
+        self._meddb_by_med = {
+            record['medication']: record
+            for record in self.medication_db.to_dict('records')
+        }
+
+        # Lowercase base name ("metformin") and full name ("metformin 500mg") -> catalog names
+        self._base_to_full: Dict[str, List[str]] = {}
+        self._catalog_rank: Dict[str, int] = {}
+        for rank, med in enumerate(self.medication_db['medication'].unique()):
+            self._catalog_rank[med] = rank
+            for key in (med.split()[0].lower(), med.lower()):
+                variants = self._base_to_full.setdefault(key, [])
+                if med not in variants:
+                    variants.append(med)
+
+        # Lowercase name -> catalog name, and one alternation per name kind so a
+        # prompt is scanned once instead of substring-tested per catalog entry
+        self._med_by_lower = dict(zip(self.medication_names_lower, self.medication_names))
+        self._cat_by_lower = dict(zip(self.categories_lower, self.categories))
+        self._base_med_re = _alternation(self.base_names_lower)
+        self._med_name_re = _alternation(self.medication_names_lower)
+        self._category_re = _alternation(self.categories_lower)
+
+        # Row positions per patient, so single-patient lookups skip a full-frame mask
+        self._rx_by_patient = self.prescription_data.groupby('patient_id', sort=False).indices
+
+        # The all-inventory view is static for the loaded data, so build it once
+        self.category_rollup = (
+            self.inventory_data.merge(
+                self.medication_db[['medication', 'category']],
+                on='medication',
+                how='left'
+            )
+            .groupby('category', observed=True)
+            .agg(quantity=('quantity', 'sum'), unit_cost=('unit_cost', 'mean'))
+            .reset_index()
+        )
+        self.category_rollup['total_value'] = (
+            self.category_rollup['quantity'] * self.category_rollup['unit_cost']
+        )
+        # Per-medication stock summary and its markdown render are static too
+        self.medication_rollup = self.inventory_data.groupby('medication').agg({
+            'quantity': 'sum',
+            'unit_cost': 'mean'
+        }).reset_index()
+        self.medication_rollup['total_value'] = (
+            self.medication_rollup['quantity'] * self.medication_rollup['unit_cost']
+        )
+        self.medication_rollup_md = self.medication_rollup.to_markdown(index=False)
+
+        # Stock per stocked medication, shared by the inventory lookups
+        self._inv_by_med = (
+            self.inventory_data
+            .assign(row_value=lambda d: d['quantity'] * d['unit_cost'])
+            .groupby('medication')
+            .agg(
+                total_quantity=('quantity', 'sum'),
+                total_value=('row_value', 'sum'),
+                lot_count=('lot_number', 'count')
+            )
+        )
+        self._inv_rows_by_med = self.inventory_data.groupby('medication', sort=False).indices
+        # Contiguous columns of the same aggregate for masked numpy reductions
+        self._inv_qty = self._inv_by_med['total_quantity'].to_numpy()
+        self._inv_value = self._inv_by_med['total_value'].to_numpy()
+
+        # Stock per catalog medication (zero-filled), in medication DB order
+        self._inventory_summary = (
+            self._inv_by_med
+            .reindex(list(self.medication_names), fill_value=0)
+            .rename_axis('medication')
+            .reset_index()
+        )
+
+        q = self.inventory_data['quantity'].to_numpy()
+        c = self.inventory_data['unit_cost'].to_numpy()
+        self._inventory_totals = {
+            "total_medications": int(self.inventory_data['medication'].nunique()),
+            "total_quantity": int(q.sum()),
+            "total_value": float(q @ c)
+        }
+
+    def patient_prescriptions(self, patient_id: str) -> pd.DataFrame:
+        """Return all prescription rows for a patient (empty frame if unknown)"""
+        positions = self._rx_by_patient.get(patient_id)
+        if positions is None:
+            return self.prescription_data.iloc[0:0]
+        return self.prescription_data.take(positions)
+
+    def _invalidate_caches(self):
+        """Drop memoized catalog lookups so they are rebuilt from current data"""
+        for name in ('medication_names', 'medication_names_lower', 'base_names_lower',
+                     'categories', 'categories_lower', 'patient_summary', 'patient_order_dates'):
+            self.__dict__.pop(name, None)
+
+    @cached_property
+    def medication_names(self) -> tuple:
+        """Unique medication names in database order"""
+        return tuple(self.medication_db['medication'].unique())
+
+    @cached_property
+    def medication_names_lower(self) -> tuple:
+        """Lowercased medication names, aligned with medication_names"""
+        return tuple(med.lower() for med in self.medication_names)
+
+    @cached_property
+    def base_names_lower(self) -> tuple:
+        """Lowercased base names (name before dosage), aligned with medication_names"""
+        return tuple(med.split()[0].lower() for med in self.medication_names)
+
+    @cached_property
+    def categories(self) -> tuple:
+        """Unique categories in database order"""
+        return tuple(self.medication_db['category'].unique())
+
+    @cached_property
+    def categories_lower(self) -> tuple:
+        """Lowercased categories, aligned with categories"""
+        return tuple(cat.lower() for cat in self.categories)
+
+    @cached_property
+    def patient_summary(self) -> pd.DataFrame:
+        """
+        Per-patient prescription aggregates.
+        Columns: patient_id, order_count, unique_medications, total_quantity.
+        """
+        return self.prescription_data.groupby('patient_id').agg(
+            order_count=('patient_id', 'size'),
+            unique_medications=('medication', 'nunique'),
+            total_quantity=('quantity', 'sum')
+        ).reset_index()
+
+    @cached_property
+    def patient_order_dates(self) -> Dict[str, List[str]]:
+        """Fill dates per patient, sorted ascending"""
+        return (
+            self.prescription_data.sort_values('fill_date')
+            .groupby('patient_id')['fill_date']
+            .apply(list)
+            .to_dict()
+        )
+
+    def match_medications(self, text_lower: str) -> List[str]:
+        """
+        Catalog medications whose base name (or single-word full name) appears
+        as a token in lowercased text, in medication DB order.
+        """
+        matched = {
+            med
+            for token in set(_TOKEN_RE.findall(text_lower))
+            for med in self._base_to_full.get(token, ())
+        }
+        return sorted(matched, key=self._catalog_rank.__getitem__)
+
+    def find_base_medication(self, text_lower: str) -> Optional[str]:
+        """First medication base name mentioned in lowercased text, if any"""
+        match = self._base_med_re.search(text_lower)
+        return match.group(0) if match else None
+
+    def find_medication(self, text_lower: str) -> Optional[str]:
+        """First full medication name (e.g. "metformin 500mg") mentioned in lowercased text"""
+        match = self._med_name_re.search(text_lower)
+        return self._med_by_lower[match.group(0)] if match else None
+
+    def find_category(self, text_lower: str) -> Optional[str]:
+        """First medication category mentioned in lowercased text"""
+        match = self._category_re.search(text_lower)
+        return self._cat_by_lower[match.group(0)] if match else None
+
+    def inventory_summary(self) -> pd.DataFrame:
+        """
+        Per-medication stock summary for every medication in the database.
+        Columns: medication, total_quantity, total_value, lot_count.
+        """
+        return self._inventory_summary
+
+    def query_inventory_bulk(self, medications: List[str]) -> Dict[str, Any]:
+        """
+        Combined stock totals for several medications in one filter.
+        Returns dict with total_quantity and total_value.
+        """
+        mask = self._inv_by_med.index.isin(medications)
+        return {
+            "total_quantity": int(self._inv_qty[mask].sum()),
+            "total_value": float(self._inv_value[mask].sum())
+        }
+
+    def inventory_below(self, threshold: int) -> pd.DataFrame:
+        """
+        Medications with total stock below threshold, lowest stock first.
+        Same columns as inventory_summary().
+        """
+        summary = self._inventory_summary
+        return summary[summary['total_quantity'] < threshold].sort_values(
+            'total_quantity', kind='stable'
+        )
+
     def query_patient_history(self, patient_id: str) -> str:
         """
         Query prescription history for a specific patient.
@@ -71,9 +598,7 @@ class DataQueryTools:
         """
         self.logger.info(f"Querying history for patient: {patient_id}")
 
-        patient_records = self.prescription_data[
-            self.prescription_data['patient_id'] == patient_id
-        ].sort_values('fill_date', ascending=False)
+        patient_records = self.patient_prescriptions(patient_id).sort_values('fill_date', ascending=False)
 
         if patient_records.empty:
             return f"ℹ️ No prescription records found for patient **{patient_id}**."
@@ -86,26 +611,27 @@ class DataQueryTools:
         )
 
         # Build formatted response
-        response = f"## 📋 Prescription History for Patient {patient_id}\n\n"
-        response += f"**Summary:**\n"
-        response += f"- Total prescriptions: {total_prescriptions}\n"
-        response += f"- Unique medications: {unique_medications}\n"
-        response += f"- Date range: {date_range[0]} to {date_range[1]}\n\n"
+        parts = [f"## 📋 Prescription History for Patient {patient_id}\n\n"]
+        parts.append(f"**Summary:**\n")
+        parts.append(f"- Total prescriptions: {total_prescriptions}\n")
+        parts.append(f"- Unique medications: {unique_medications}\n")
+        parts.append(f"- Date range: {date_range[0]} to {date_range[1]}\n\n")
 
         # List medications
-        response += f"**Medications:**\n"
+        parts.append(f"**Medications:**\n")
         for med in patient_records['medication'].unique():
             med_count = len(patient_records[patient_records['medication'] == med])
-            response += f"- {med} ({med_count} refill{'s' if med_count > 1 else ''})\n"
+            parts.append(f"- {med} ({med_count} refill{'s' if med_count > 1 else ''})\n")
 
         # Recent prescription fills
-        response += f"\n**Recent Prescription Fills (Last {min(10, total_prescriptions)}):**\n\n"
-        for idx, record in patient_records.head(10).iterrows():
-            response += f"**{record['fill_date']}** — {record['medication']}\n"
-            response += f"  - Quantity: {record['quantity']} units\n"
-            response += f"  - Days supply: {record['days_supply']} days\n\n"
+        parts.append(f"\n**Recent Prescription Fills (Last {min(10, total_prescriptions)}):**\n\n")
+        recent = patient_records.head(10)[['fill_date', 'medication', 'quantity', 'days_supply']]
+        for fill_date, medication, quantity, days_supply in recent.itertuples(index=False, name=None):
+            parts.append(f"**{fill_date}** — {medication}\n")
+            parts.append(f"  - Quantity: {quantity} units\n")
+            parts.append(f"  - Days supply: {days_supply} days\n\n")
 
-        return response
+        return "".join(parts)
 
     def query_inventory(self, medication: Optional[str] = None,
                        category: Optional[str] = None) -> str:
@@ -113,37 +639,39 @@ class DataQueryTools:
         Query current inventory for specific medication or category.
         Returns JSON string with inventory details.
         """
+        result = self._query_inventory_impl(medication=medication, category=category)
+        return _dumps(result, indent=result["found"])
+
+    def _query_inventory_impl(self, medication: Optional[str] = None,
+                              category: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Query current inventory for specific medication or category.
+        Returns dict with inventory details.
+        """
         if medication:
             self.logger.info(f"Querying inventory for medication: {medication}")
 
-            med_inventory = self.inventory_data[
-                self.inventory_data['medication'] == medication
-            ]
+            positions = self._inv_rows_by_med.get(medication)
 
-            if med_inventory.empty:
-                return json.dumps({
+            if positions is None:
+                return {
                     "medication": medication,
                     "found": False,
                     "message": f"No inventory found for {medication}"
-                })
-
-            med_info = self.medication_db[
-                self.medication_db['medication'] == medication
-            ]
+                }
 
-            total_quantity = int(med_inventory['quantity'].sum())
-            total_value = float((med_inventory['quantity'] * med_inventory['unit_cost']).sum())
-            lot_count = len(med_inventory)
+            med_record = self._meddb_by_med.get(medication)
+            totals = self._inv_by_med.loc[medication]
 
-            return json.dumps({
+            return {
                 "medication": medication,
                 "found": True,
-                "category": med_info['category'].iloc[0] if not med_info.empty else "Unknown",
-                "total_quantity": total_quantity,
-                "total_value": total_value,
-                "lot_count": lot_count,
-                "lots": med_inventory.to_dict('records')
-            }, indent=2)
+                "category": med_record['category'] if med_record else "Unknown",
+                "total_quantity": int(totals['total_quantity']),
+                "total_value": float(totals['total_value']),
+                "lot_count": len(positions),
+                "lots": self.inventory_data.take(positions).to_dict('records')
+            }
 
         elif category:
             self.logger.info(f"Querying inventory for category: {category}")
@@ -153,81 +681,61 @@ class DataQueryTools:
             ]['medication'].tolist()
 
             if not category_meds:
-                return json.dumps({
+                return {
                     "category": category,
                     "found": False,
                     "message": f"No medications found in category {category}"
-                })
-
-            category_inventory = self.inventory_data[
-                self.inventory_data['medication'].isin(category_meds)
-            ]
-
-            inventory_summary = category_inventory.groupby('medication').agg({
-                'quantity': 'sum',
-                'unit_cost': 'mean'
-            }).reset_index()
+                }
 
-            inventory_summary['total_value'] = (
-                inventory_summary['quantity'] * inventory_summary['unit_cost']
-            )
+            # Category view is a slice of the precomputed per-medication rollup
+            inventory_summary = self.medication_rollup[
+                self.medication_rollup['medication'].isin(category_meds)
+            ].reset_index(drop=True)
 
             total_value = float(inventory_summary['total_value'].sum())
             total_quantity = int(inventory_summary['quantity'].sum())
 
-            return json.dumps({
+            return {
                 "category": category,
                 "found": True,
                 "medication_count": len(inventory_summary),
                 "total_quantity": total_quantity,
                 "total_value": total_value,
                 "medications": inventory_summary.to_dict('records')
-            }, indent=2)
+            }
 
         else:
             self.logger.info("Querying all inventory")
 
-            total_value = float((self.inventory_data['quantity'] * self.inventory_data['unit_cost']).sum())
-            total_quantity = int(self.inventory_data['quantity'].sum())
-
-            category_summary = self.inventory_data.merge(
-                self.medication_db[['medication', 'category']],
-                on='medication',
-                how='left'
-            ).groupby('category').agg({
-                'quantity': 'sum',
-                'unit_cost': 'mean'
-            }).reset_index()
-
-            category_summary['total_value'] = (
-                category_summary['quantity'] * category_summary['unit_cost']
-            )
-
-            return json.dumps({
+            return {
                 "found": True,
-                "total_medications": int(self.inventory_data['medication'].nunique()),
-                "total_quantity": total_quantity,
-                "total_value": total_value,
-                "categories": category_summary.to_dict('records')
-            }, indent=2)
+                **self._inventory_totals,
+                "categories": self.category_rollup.to_dict('records')
+            }
 
     def query_medication_info(self, medication: str) -> str:
         """
         Get detailed information about a medication.
         Returns JSON string with medication details.
         """
+        result = self._query_medication_info_impl(medication)
+        return _dumps(result, indent=result["found"])
+
+    def _query_medication_info_impl(self, medication: str) -> Dict[str, Any]:
+        """
+        Get detailed information about a medication.
+        Returns dict with medication details.
+        """
         self.logger.info(f"Querying medication info: {medication}")
 
-        med_info = self.medication_db[
-            self.medication_db['medication'] == medication
-        ]
+        med_record = self._meddb_by_med.get(medication)
 
-        if med_info.empty:
-            return json.dumps({
+        if med_record is None:
+            return {
                 "medication": medication,
                 "found": False,
                 "message": f"Medication {medication} not found in database"
-            })
+            }
 
         prescription_history = self.prescription_data[
             self.prescription_data['medication'] == medication
@@ -237,25 +745,32 @@ class DataQueryTools:
             self.inventory_data['medication'] == medication
         ]
 
-        return json.dumps({
+        return {
             "medication": medication,
             "found": True,
-            "info": med_info.to_dict('records')[0],
+            "info": med_record,
             "total_patients": int(prescription_history['patient_id'].nunique()),
             "total_prescriptions": len(prescription_history),
             "current_stock": int(current_inventory['quantity'].sum()) if not current_inventory.empty else 0
-        }, indent=2)
+        }
 
     def list_categories(self) -> str:
         """
         List all medication categories in the database.
         Returns JSON string with category list.
         """
-        categories = self.medication_db['category'].unique().tolist()
-        return json.dumps({
+        return _dumps(self._list_categories_impl())
+
+    def _list_categories_impl(self) -> Dict[str, Any]:
+        """
+        List all medication categories in the database.
+        Returns dict with category list.
+        """
+        categories = list(self.categories)
+        return {
             "categories": categories,
             "total_categories": len(categories)
-        }, indent=2)
+        }
 
 
 # ============================================================================
@@ -277,6 +792,40 @@ class IntelligentDataQueryAgent:
         self.agent = self._build_agent()
         self.runner = InMemoryRunner(agent=self.agent)
 
+        # Dataset overview is constant for the loaded data; only the question varies
+        self._data_summary_template = self._build_data_summary_template()
+
+    def _build_data_summary_template(self) -> str:
+        """Build the dataset overview prompt once, leaving a {user_query} placeholder"""
+
+        def sample(df: pd.DataFrame) -> str:
+            # Escape braces so str.format only fills the user_query slot
+            return df.head(3).to_json(orient='records').replace('{', '{{').replace('}', '}}')
+
+        prescriptions = self.data_tools.prescription_data
+        inventory = self.data_tools.inventory_data
+        medication_db = self.data_tools.medication_db
+
+        return f"""
+**Available Data:**
+
+**Prescription Data ({len(prescriptions)} records):**
+Columns: {list(prescriptions.columns)}
+Sample: {sample(prescriptions)}
+
+**Inventory Data ({len(inventory)} records):**
+Columns: {list(inventory.columns)}
+Sample: {sample(inventory)}
+
+**Medication Database ({len(medication_db)} medications):**
+Columns: {list(medication_db.columns)}
+Sample: {sample(medication_db)}
+
+**User Question:** {{user_query}}
+
+Please analyze the data and provide a complete answer in well-formatted markdown.
+"""
+
     def _build_agent(self) -> LlmAgent:
         """Build LLM agent for intelligent data queries"""
 
@@ -339,10 +888,9 @@ Answer the user's question directly and completely. Never omit data that was pro
 
             # Add header based on query type
             if "top" in query_lower or "bottom" in query_lower:
-                import re
-                num_match = re.search(r'(?:top|bottom)[-\s]*(\d+)', query_lower)
+                num_match = _RANK_NUM_RE.search(query_lower)
                 top_n = int(num_match.group(1)) if num_match else 10
-                ascending = any(word in query_lower for word in ["least", "fewest", "lowest", "bottom"])
+                ascending = _ASC_RE.search(query_lower) is not None
                 sort_label = "Fewest" if ascending else "Most"
 
                 header = f"## 👥 Top {top_n} Patients with {sort_label} Orders\n\n"
@@ -351,25 +899,7 @@ Answer the user's question directly and completely. Never omit data that was pro
                 return analysis_context
 
         # For other queries, use LLM to format nicely
-        data_summary = f"""
-**Available Data:**
-
-**Prescription Data ({len(self.data_tools.prescription_data)} records):**
-Columns: {list(self.data_tools.prescription_data.columns)}
-Sample: {self.data_tools.prescription_data.head(3).to_dict('records')}
-
-**Inventory Data ({len(self.data_tools.inventory_data)} records):**
-Columns: {list(self.data_tools.inventory_data.columns)}
-Sample: {self.data_tools.inventory_data.head(3).to_dict('records')}
-
-**Medication Database ({len(self.data_tools.medication_db)} medications):**
-Columns: {list(self.data_tools.medication_db.columns)}
-Sample: {self.data_tools.medication_db.head(3).to_dict('records')}
-
-**User Question:** {user_query}
-
-Please analyze the data and provide a complete answer in well-formatted markdown.
-"""
+        data_summary = self._data_summary_template.format(user_query=user_query)
 
         full_prompt = f"{data_summary}\n\n**Analysis Results:**\n{analysis_context}\n\nNow format this into a clear, professional response. Include ALL details from the analysis results - do not summarize or omit any information."
 
@@ -378,12 +908,7 @@ Please analyze the data and provide a complete answer in well-formatted markdown
             response = await self.runner.run(full_prompt)
 
             # Extract text from response
-            if hasattr(response, 'text'):
-                return response.text
-            elif isinstance(response, str):
-                return response
-            else:
-                return str(response)
+            return _extract_response_text(response)
 
         except Exception as e:
             self.logger.error(f"Error running LLM query: {e}")
@@ -410,18 +935,12 @@ Please analyze the data and provide a complete answer in well-formatted markdown
         # If query mentions patient, include patient data
         if "patient" in query_lower:
             # Try to extract patient ID
-            words = query.split()
-            patient_id = None
-            for i, word in enumerate(words):
-                if word.lower() == "patient" and i + 1 < len(words):
-                    patient_id = words[i + 1].strip('.,!?')
-                    break
+            match = _PATIENT_ID_RE.search(query)
+            patient_id = match.group(1) if match else None
 
             if patient_id:
                 self.logger.info(f"  Extracting data for patient {patient_id}")
-                patient_data = self.data_tools.prescription_data[
-                    self.data_tools.prescription_data['patient_id'] == patient_id
-                ]
+                patient_data = self.data_tools.patient_prescriptions(patient_id)
                 if not patient_data.empty:
                     self.logger.info(f"    Found {len(patient_data)} prescription records")
                     result_parts.append(f"### Patient {patient_id} Prescription Data:\n")
@@ -432,16 +951,10 @@ Please analyze the data and provide a complete answer in well-formatted markdown
                         self.logger.info(f"    Query also asks for inventory - adding inventory data")
                         patient_meds = patient_data['medication'].unique()
                         self.logger.info(f"    Patient has taken {len(patient_meds)} unique medications: {list(patient_meds)}")
-                        inventory_data = self.data_tools.inventory_data[
-                            self.data_tools.inventory_data['medication'].isin(patient_meds)
-                        ]
-                        if not inventory_data.empty:
-                            self.logger.info(f"    Found inventory data for {len(inventory_data)} lots")
-                            inventory_summary = inventory_data.groupby('medication').agg({
-                                'quantity': 'sum',
-                                'unit_cost': 'mean'
-                            }).reset_index()
-                            inventory_summary['total_value'] = inventory_summary['quantity'] * inventory_summary['unit_cost']
+                        rollup = self.data_tools.medication_rollup
+                        inventory_summary = rollup[rollup['medication'].isin(patient_meds)]
+                        if not inventory_summary.empty:
+                            self.logger.info(f"    Found inventory data for {len(inventory_summary)} medications")
                             result_parts.append(f"\n\n### Inventory for Patient {patient_id}'s Medications:\n")
                             result_parts.append(inventory_summary.to_markdown(index=False))
                         else:
@@ -454,13 +967,8 @@ Please analyze the data and provide a complete answer in well-formatted markdown
 
         # If query asks for general inventory
         elif "inventory" in query_lower or "stock" in query_lower:
-            inventory_summary = self.data_tools.inventory_data.groupby('medication').agg({
-                'quantity': 'sum',
-                'unit_cost': 'mean'
-            }).reset_index()
-            inventory_summary['total_value'] = inventory_summary['quantity'] * inventory_summary['unit_cost']
             result_parts.append("### Current Inventory:\n")
-            result_parts.append(inventory_summary.to_markdown(index=False))
+            result_parts.append(self.data_tools.medication_rollup_md)
 
         if result_parts:
             return "\n".join(result_parts)
@@ -469,73 +977,68 @@ Please analyze the data and provide a complete answer in well-formatted markdown
 
     def _handle_ranking_query(self, query: str, query_lower: str) -> str:
         """Handle top/bottom ranking queries"""
-        import re
-
         # Extract number
-        num_match = re.search(r'(?:top|bottom)[-\s]*(\d+)', query_lower)
+        num_match = _RANK_NUM_RE.search(query_lower)
         top_n = int(num_match.group(1)) if num_match else 10
 
         # Determine sort order
-        ascending = any(word in query_lower for word in ["least", "fewest", "lowest", "bottom"])
+        ascending = _ASC_RE.search(query_lower) is not None
 
         # Check what to include
-        include_dates = "date" in query_lower or "dates" in query_lower
-        include_medications = any(word in query_lower for word in ["medicine", "medicines", "medication", "medications", "drug", "drugs", "bought", "purchased", "ordered"])
+        include_dates = "date" in query_lower
+        include_medications = _MED_RE.search(query_lower) is not None
 
-        # Group by patient
-        patient_counts = self.data_tools.prescription_data.groupby('patient_id').agg({
-            'medication': 'count',
-            'quantity': 'sum',
-            'fill_date': lambda x: sorted(x.tolist()) if include_dates else []
-        }).reset_index()
-
-        patient_counts.columns = ['patient_id', 'order_count', 'total_quantity', 'order_dates']
-        patient_counts = patient_counts.sort_values('order_count', ascending=ascending).head(top_n)
-
-        # Also get unique medication count
-        unique_meds = self.data_tools.prescription_data.groupby('patient_id')['medication'].nunique()
-        patient_counts['unique_medications'] = patient_counts['patient_id'].map(unique_meds)
+        # Rank from the cached per-patient aggregates
+        patient_counts = self.data_tools.patient_summary.sort_values(
+            'order_count', ascending=ascending
+        ).head(top_n)
+        order_dates = self.data_tools.patient_order_dates
+        patient_counts = patient_counts.assign(
+            order_dates=[order_dates[pid] if include_dates else [] for pid in patient_counts['patient_id']]
+        )[['patient_id', 'order_count', 'total_quantity', 'order_dates', 'unique_medications']]
 
-        result = patient_counts.to_markdown(index=False)
+        parts = [patient_counts.to_markdown(index=False)]
 
         # If user wants medications, add detailed medication list for each patient
         if include_medications:
-            result += "\n\n## Medications Purchased by These Patients:\n\n"
-            for patient_id in patient_counts['patient_id']:
-                patient_prescriptions = self.data_tools.prescription_data[
-                    self.data_tools.prescription_data['patient_id'] == patient_id
-                ]
+            parts.append("\n\n## Medications Purchased by These Patients:\n\n")
+
+            # Gather every selected patient's prescriptions in one filter pass
+            prescriptions = self.data_tools.prescription_data
+            top_ids = patient_counts['patient_id'].to_numpy()
+            selected = prescriptions.loc[prescriptions['patient_id'].isin(top_ids)]
+            groups = {
+                pid: group
+                for pid, group in selected.groupby('patient_id', sort=False, observed=True)
+            }
+
+            for patient_id in top_ids:
+                patient_prescriptions = groups[patient_id]
 
                 # Get all medications with details
                 patient_meds = patient_prescriptions[['medication', 'fill_date', 'quantity']].sort_values('fill_date', ascending=False)
 
-                result += f"### Patient {patient_id} ({len(patient_meds)} orders):\n\n"
+                parts.append(f"### Patient {patient_id} ({len(patient_meds)} orders):\n\n")
 
                 # Show unique medications summary first
                 unique_meds = patient_prescriptions['medication'].unique()
-                result += f"**Medications:** {', '.join(unique_meds)}\n\n"
+                parts.append(f"**Medications:** {', '.join(unique_meds)}\n\n")
 
                 # Show detailed order history
-                result += "**Order History:**\n\n"
-                result += patient_meds.to_markdown(index=False)
-                result += "\n\n"
+                parts.append("**Order History:**\n\n")
+                parts.append(patient_meds.to_markdown(index=False))
+                parts.append("\n\n")
 
-        return result
+        return "".join(parts)
 
     def _handle_patient_history(self, query: str, query_lower: str) -> str:
         """Handle patient history queries"""
         # Extract patient ID
-        words = query.split()
-        patient_id = None
-        for i, word in enumerate(words):
-            if word.lower() == "patient" and i + 1 < len(words):
-                patient_id = words[i + 1].strip('.,!?')
-                break
+        match = _PATIENT_ID_RE.search(query)
+        patient_id = match.group(1) if match else None
 
         if patient_id:
-            patient_data = self.data_tools.prescription_data[
-                self.data_tools.prescription_data['patient_id'] == patient_id
-            ]
+            patient_data = self.data_tools.patient_prescriptions(patient_id)
             return patient_data.to_markdown(index=False)
 
         return "Could not identify patient ID in query."
@@ -543,70 +1046,52 @@ Please analyze the data and provide a complete answer in well-formatted markdown
     def _handle_inventory_query(self, query: str, query_lower: str) -> str:
         """Handle inventory queries"""
         # For now, return inventory summary
-        inventory_summary = self.data_tools.inventory_data.groupby('medication').agg({
-            'quantity': 'sum',
-            'unit_cost': 'mean'
-        }).reset_index()
-        inventory_summary['total_value'] = inventory_summary['quantity'] * inventory_summary['unit_cost']
-
-        return inventory_summary.to_markdown(index=False)
+        return self.data_tools.medication_rollup_md
 
     def query(self, user_query: str) -> str:
         """Synchronous query wrapper"""
         return asyncio.run(self.query_async(user_query))
 
 
-# ============================================================================
-# A2A ORCHESTRATOR - Main agent coordinator
-# ============================================================================
-
-class ApothecaryOrchestrator:
+def _format_conditional_response(med_title: str, total_qty: int, total_value: float,
+                                 matched_meds: List[str], threshold: int,
+                                 analysis_result: Optional[str]) -> str:
     """
-    A2A-based orchestrator using Google ADK.
-    Routes user requests to appropriate agents via Agent-to-Agent protocol.
+    Markdown for a conditional inventory query. analysis_result is the scoped
+    pipeline output when stock is below threshold, else None.
     """
+    # Format initial response
+    parts = [f"## 📦 Inventory Check: {med_title}\n\n"]
+    parts.append(f"**Current inventory:** {total_qty:,} units\n")
+    parts.append(f"**Total value:** ${total_value:,.2f}\n")
+    parts.append(f"**Variants:** {len(matched_meds)}\n\n")
 
-    def __init__(self, api_key: Optional[str] = None, enable_agui: bool = True):
-        self.logger = setup_logger("ApothecaryOrchestrator")
-        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-
-        if not self.api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment or parameters")
+    # Check condition
+    if total_qty < threshold:
+        parts.append(f"⚠️ **Condition met:** Inventory ({total_qty:,} units) is **below** the threshold of {threshold:,} units.\n\n")
+        parts.append(f"Proceeding with {med_title}-specific demand forecast and optimization analysis...\n\n")
+        parts.append("---\n\n")
 
-        # Initialize AG-UI protocol handler
-        self.enable_agui = enable_agui
-        self.agui = AGUIMessageHandler(enable_streaming=enable_agui) if enable_agui else None
-
-        # Initialize data query tools
-        self.data_tools = DataQueryTools()
-
-        # Initialize intelligent data query agent
-        self.logger.info("Initializing Intelligent Data Query Agent...")
-        self.intelligent_query_agent = IntelligentDataQueryAgent(
-            data_tools=self.data_tools,
-            api_key=self.api_key
-        )
+        # For medication-specific analysis, show focused results
+        parts.append(f"## 📊 {med_title} Demand Forecast & Optimization\n\n")
 
-        # Initialize A2A wrapper agents
-        self.logger.info("Initializing A2A sub-agents...")
-        self.patient_agent = PatientAnalysisA2AAgent(api_key=self.api_key)
-        self.forecasting_agent = ForecastingA2AAgent(api_key=self.api_key)
-        self.complete_agent = CompleteAnalysisA2AAgent(api_key=self.api_key)
+        # The scoped analysis already reports profiles, forecast and orders
+        parts.append(f"The analysis below considers:\n")
+        parts.append(f"- Patient refill predictions for {med_title} patients\n")
+        parts.append(f"- Flu activity impact (current level affecting demand)\n")
+        parts.append(f"- Economic Order Quantity (EOQ) optimization\n")
+        parts.append(f"- Safety stock calculations (7-day buffer)\n\n")
 
-        # Build orchestrator agent with sub-agents
-        self.agent = self._build_orchestrator_agent()
-        self.runner = InMemoryRunner(agent=self.agent)
+        parts.append(analysis_result)
+    else:
+        parts.append(f"✅ **Condition not met:** Inventory ({total_qty:,} units) is **above** the threshold of {threshold:,} units.\n\n")
+        parts.append(f"No action needed. Current stock levels are sufficient.")
 
-        # Initialize follow-up action router
-        self.action_router = FollowUpActionRouter(self) if enable_agui else None
+    return "".join(parts)
 
-        self.logger.info("A2A Orchestrator initialized with sub-agents" + (" and AG-UI protocol" if enable_agui else ""))
 
-    def _build_orchestrator_agent(self) -> LlmAgent:
-        """
-        Build the orchestrator LlmAgent with sub-agents and tools.
-        """
-        orchestrator_instruction = """You are the Apothecary-AI Orchestrator.
+# Routing instruction for the orchestrator LlmAgent
+_ORCHESTRATOR_INSTRUCTION = """You are the Apothecary-AI Orchestrator.
 
 Your role is to understand user requests about pharmacy inventory management and route them to the appropriate agents or tools.
 
@@ -629,6 +1114,10 @@ You have these tools for direct data queries:
 1. `check_inventory(medication)` - Get current stock levels (returns total_quantity, total_value, variants)
 2. `check_patient_history(patient_id)` - Get prescription history for a patient
 3. `get_medication_info(medication)` - Get medication details (category, case_size, lead_time)
+4. `run_agents_batch(invocations)` - Run several sub-agents concurrently and return all their results.
+   Each invocation is `{"agent": "<AgentName>", "args": {...}}`, e.g.
+   `[{"agent": "ForecastingAgent", "args": {"forecast_days": 30}}, {"agent": "CompleteAnalysisAgent", "args": {}}]`
+   CompleteAnalysisAgent accepts `{"medication_filter": "<name>"}` to analyze a single medication's variants.
 
 **Available Sub-Agents:**
 1. `PatientAnalysisAgent` - Analyze patient refill patterns and predict future refills
@@ -651,6 +1140,8 @@ You have these tools for direct data queries:
      - If true: "This is below the threshold of Y units, proceeding with demand forecast and optimization..."
      - If false: "This is above the threshold of Y units, no action needed."
   5. If condition true: Route to CompleteAnalysisAgent and include its response
+     (when both ForecastingAgent and OptimizationAgent results are needed and neither depends on the other,
+     issue ONE `run_agents_batch` call instead of calling them one after another)
   6. **Return combined natural language response** with:
      - Inventory status
      - Condition explanation
@@ -671,8 +1162,112 @@ You have these tools for direct data queries:
 Always choose the most efficient path: use tools for simple queries, use agents for complex analysis.
 """
 
+
+# ============================================================================
+# A2A ORCHESTRATOR - Main agent coordinator
+# ============================================================================
+
+class ApothecaryOrchestrator:
+    """
+    A2A-based orchestrator using Google ADK.
+    Routes user requests to appropriate agents via Agent-to-Agent protocol.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, enable_agui: bool = True):
+        self.logger = setup_logger("ApothecaryOrchestrator")
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+
+        if not self.api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment or parameters")
+
+        # Initialize AG-UI protocol handler
+        self.enable_agui = enable_agui
+        self._agui = AGUIMessageHandler(enable_streaming=enable_agui) if enable_agui else None
+        # Per-task handler override used by process_batch
+        self._request_agui: ContextVar[Optional[AGUIMessageHandler]] = ContextVar(
+            f"request_agui_{id(self)}", default=None
+        )
+
+        # Initialize data query tools
+        self.data_tools = DataQueryTools()
+
+        # Sub-agent results, reused for repeated identical calls
+        self._agent_cache = _AgentCache(self.data_tools.data_dir)
+
+        # LLM query agent, A2A sub-agents, orchestrator agent and runner are built
+        # lazily on first use (see the cached properties below), so direct data
+        # queries never pay for agent construction
+
+        # Initialize follow-up action router
+        self.action_router = FollowUpActionRouter(self) if enable_agui else None
+
+        # Direct-query handlers in priority order (see _direct_query_routes)
+        self._direct_query_handlers = {
+            "PATIENT_HISTORY": self._handle_patient_history,
+            "INVENTORY_MATCH": self._handle_inventory_match,
+            "INVENTORY_THRESHOLD": self._handle_threshold,
+            "INVENTORY_CATEGORY": self._handle_category,
+            "TOP_CUSTOMERS": self._handle_topn,
+            "MED_INFO": self._handle_medinfo,
+            "LIST_CATEGORIES": self._handle_list_categories,
+            "LLM_DATA_QUERY": self._handle_llm_data_query,
+        }
+
+        self.logger.info("A2A Orchestrator initialized" + (" with AG-UI protocol" if enable_agui else ""))
+
+    @cached_property
+    def intelligent_query_agent(self) -> IntelligentDataQueryAgent:
+        """LLM-powered data query agent"""
+        self.logger.info("Initializing Intelligent Data Query Agent...")
+        return IntelligentDataQueryAgent(
+            data_tools=self.data_tools,
+            api_key=self.api_key
+        )
+
+    @cached_property
+    def patient_agent(self) -> PatientAnalysisA2AAgent:
+        """A2A patient analysis sub-agent"""
+        self.logger.info("Initializing PatientAnalysis A2A sub-agent...")
+        return PatientAnalysisA2AAgent(api_key=self.api_key)
+
+    @cached_property
+    def forecasting_agent(self) -> ForecastingA2AAgent:
+        """A2A forecasting sub-agent"""
+        self.logger.info("Initializing Forecasting A2A sub-agent...")
+        return ForecastingA2AAgent(api_key=self.api_key)
+
+    @cached_property
+    def complete_agent(self) -> CompleteAnalysisA2AAgent:
+        """A2A complete-pipeline sub-agent"""
+        self.logger.info("Initializing CompleteAnalysis A2A sub-agent...")
+        return CompleteAnalysisA2AAgent(api_key=self.api_key)
+
+    @cached_property
+    def agent(self) -> LlmAgent:
+        """Orchestrator agent with sub-agents (constructs all three sub-agents)"""
+        return self._build_orchestrator_agent()
+
+    @cached_property
+    def runner(self) -> InMemoryRunner:
+        """Runner for the orchestrator agent"""
+        return InMemoryRunner(agent=self.agent)
+
+    @property
+    def agui(self) -> Optional[AGUIMessageHandler]:
+        """AG-UI handler for the current request (task-local inside process_batch)"""
+        handler = self._request_agui.get()
+        return handler if handler is not None else self._agui
+
+    @agui.setter
+    def agui(self, handler: Optional[AGUIMessageHandler]):
+        self._agui = handler
+
+    def _build_orchestrator_agent(self) -> LlmAgent:
+        """
+        Build the orchestrator LlmAgent with sub-agents and tools.
+        """
         # Define tool functions for the orchestrator agent
-        def check_inventory(medication: str) -> str:
+        async def check_inventory(medication: str) -> str:
             """
             Check current inventory levels for a medication.
 
@@ -682,36 +1277,22 @@ Always choose the most efficient path: use tools for simple queries, use agents
             Returns:
                 JSON string with inventory details including total_quantity, total_value, lot_count
             """
-            # Find matching medications
-            matched_meds = []
-            for med in self.data_tools.medication_db['medication'].unique():
-                base_med = med.split()[0].lower()
-                if base_med == medication.lower() or med.lower() == medication.lower():
-                    matched_meds.append(med)
+            # Find matching medications (base name or full name)
+            matched_meds = self.data_tools._base_to_full.get(medication.lower(), [])
 
             if not matched_meds:
-                return json.dumps({"found": False, "message": f"No medication found matching '{medication}'"})
-
-            # Query inventory for all variants
-            total_qty = 0
-            total_value = 0.0
-            results = []
+                return _dumps({"found": False, "message": f"No medication found matching '{medication}'"}, indent=False)
 
-            for med in matched_meds:
-                result = self.data_tools.query_inventory(medication=med)
-                result_data = json.loads(result)
-                results.append(result_data)
-                total_qty += result_data.get('total_quantity', 0)
-                total_value += result_data.get('total_value', 0)
+            # Query inventory for all variants concurrently
+            results = await self._query_inventory_variants(matched_meds)
 
-            return json.dumps({
+            return _dumps({
                 "found": True,
                 "medication": medication,
                 "variants": results,
-                "total_quantity": total_qty,
-                "total_value": total_value,
+                **self.data_tools.query_inventory_bulk(matched_meds),
                 "variant_count": len(matched_meds)
-            })
+            }, indent=False)
 
         def check_patient_history(patient_id: str) -> str:
             """
@@ -721,11 +1302,10 @@ Always choose the most efficient path: use tools for simple queries, use agents
                 patient_id: Patient identifier (e.g., 'P0001')
 
             Returns:
-                JSON string with patient prescription records
+                Markdown summary of the patient's prescription records
             """
-            result = self.data_tools.query_patient_history(patient_id)
-            # The result is already formatted markdown, wrap it in JSON
-            return json.dumps({"patient_id": patient_id, "history": result})
+            # Already formatted markdown; pass it through as-is
+            return self.data_tools.query_patient_history(patient_id)
 
         def get_medication_info(medication: str) -> str:
             """
@@ -739,13 +1319,35 @@ Always choose the most efficient path: use tools for simple queries, use agents
             """
             return self.data_tools.query_medication_info(medication)
 
+        async def run_agents_batch(invocations: list[dict]) -> str:
+            """
+            Run independent sub-agent analyses concurrently.
+
+            Args:
+                invocations: List of {"agent": name, "args": {...}} where name is one of
+                    PatientAnalysisAgent, ForecastingAgent, OptimizationAgent, CompleteAnalysisAgent
+
+            Returns:
+                JSON list with one {"agent", "result"} (or {"agent", "error"}) entry per invocation, in order
+            """
+            results = await asyncio.gather(
+                *(self._invoke_sub_agent(inv.get('agent', ''), inv.get('args') or {}) for inv in invocations),
+                return_exceptions=True
+            )
+
+            return _dumps([
+                {"agent": inv.get('agent'), "error": str(result)} if isinstance(result, Exception)
+                else {"agent": inv.get('agent'), "result": result}
+                for inv, result in zip(invocations, results)
+            ], indent=False)
+
         # Create orchestrator agent with tools and sub-agents
         orchestrator = LlmAgent(
             name="ApothecaryOrchestrator",
             model="gemini-2.0-flash-exp",
-            instruction=orchestrator_instruction,
+            instruction=_ORCHESTRATOR_INSTRUCTION,
             description="Main orchestrator for Apothecary-AI pharmacy inventory management system",
-            tools=[check_inventory, check_patient_history, get_medication_info],
+            tools=[check_inventory, check_patient_history, get_medication_info, run_agents_batch],
             sub_agents=[
                 self.patient_agent.agent,
                 self.forecasting_agent.agent,
@@ -811,31 +1413,22 @@ Always choose the most efficient path: use tools for simple queries, use agents
             # TODO: Implement proper LLM orchestrator agent invocation
             agent_type, agent_result = await self._route_to_agent_with_agui(user_prompt)
 
-            self.logger.info(f"Agent result type: {type(agent_result)}")
-            if isinstance(agent_result, str):
-                self.logger.info(f"Agent result length: {len(agent_result)}")
-                self.logger.info(f"Agent result preview: {agent_result[:200] if agent_result else 'EMPTY'}")
+            agent_text = agent_result.text
+            self.logger.info(f"Agent result kind: {agent_result.kind}")
+            self.logger.info(f"Agent result length: {len(agent_text)}")
+            self.logger.info(f"Agent result preview: {agent_text[:200] if agent_text else 'EMPTY'}")
 
-            # Parse result
+            # The agent already said what it produced, so no sniffing or re-parsing
             is_formatted_markdown = False
-            if isinstance(agent_result, str):
-                # Handle empty responses
-                if not agent_result or not agent_result.strip():
-                    self.logger.warning("Agent returned empty response")
-                    result_data = {"raw_response": "No response from agent"}
-                # Check if this is formatted markdown (starts with ## or has newlines)
-                elif agent_result.strip().startswith("##") or "\n\n" in agent_result:
-                    is_formatted_markdown = True
-                    result_data = {"formatted_response": agent_result}
-                else:
-                    try:
-                        result_data = json.loads(agent_result)
-                    except json.JSONDecodeError as e:
-                        self.logger.warning(f"Failed to parse agent result as JSON: {e}")
-                        self.logger.warning(f"Raw result: {agent_result[:500]}")
-                        result_data = {"raw_response": agent_result}
+            # Handle empty responses
+            if not agent_text or agent_text.isspace():
+                self.logger.warning("Agent returned empty response")
+                result_data = {"raw_response": "No response from agent"}
+            elif agent_result.kind == "markdown":
+                is_formatted_markdown = True
+                result_data = {"formatted_response": agent_text}
             else:
-                result_data = agent_result
+                result_data = agent_result.data if agent_result.data is not None else {"raw_response": agent_text}
 
             # Generate suggestions
             if self.agui:
@@ -843,8 +1436,8 @@ Always choose the most efficient path: use tools for simple queries, use agents
                 if is_formatted_markdown:
                     self.agui.result(
                         agent=agent_type,
-                        summary=agent_result,
-                        details={"formatted_response": agent_result},
+                        summary=f"{agent_type} analysis completed",
+                        details={"formatted_response": agent_text},
                         reasoning="Analysis completed successfully"
                     )
 
@@ -859,7 +1452,7 @@ Always choose the most efficient path: use tools for simple queries, use agents
                 )
                 return final
 
-            return agent_result
+            return agent_text
 
         except Exception as e:
             self.logger.error(f"Error processing request: {e}")
@@ -874,6 +1467,87 @@ Always choose the most efficient path: use tools for simple queries, use agents
 
             return error_msg
 
+    async def process_batch(self, user_prompts: List[str], max_concurrency: int = 8) -> List[Any]:
+        """
+        Process several requests concurrently.
+
+        The shared AG-UI handler is cleared at the start of every request, so
+        concurrent process_request calls on it are not safe. Each prompt here
+        runs in its own task with a private handler that forwards to the same
+        registered callbacks.
+
+        Args:
+            user_prompts: Natural language user requests
+            max_concurrency: Maximum number of requests in flight
+
+        Returns:
+            One process_request result per prompt, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(prompt: str) -> Any:
+            async with semaphore:
+                # gather() runs each coroutine in its own task/context copy
+                return await self._with_request_handler(self.process_request(prompt))
+
+        return await asyncio.gather(*(run_one(prompt) for prompt in user_prompts))
+
+    async def _with_request_handler(self, coro) -> Any:
+        """
+        Await coro with a private AG-UI handler for this request that forwards
+        to the shared handler's registered callbacks.
+
+        Must run in its own task (as run(), run_action() and process_batch do),
+        since the handler is set on the task's context.
+        """
+        if self._agui is not None:
+            handler = AGUIMessageHandler(enable_streaming=self._agui.enable_streaming)
+            handler.callbacks = list(self._agui.callbacks)
+            self._request_agui.set(handler)
+        return await coro
+
+    async def _invoke_sub_agent(self, agent_name: str, args: Dict[str, Any]) -> str:
+        """Run one A2A sub-agent in a worker thread so several can run concurrently"""
+        # Attribute names, so only the requested (lazily built) agent is constructed
+        agents = {
+            "PatientAnalysisAgent": "patient_agent",
+            "ForecastingAgent": "forecasting_agent",
+            # Optimization only runs as part of the complete pipeline
+            "OptimizationAgent": "complete_agent",
+            "CompleteAnalysisAgent": "complete_agent",
+        }
+        if agent_name not in agents:
+            raise ValueError(f"Unknown agent '{agent_name}'")
+        agent_attr = agents[agent_name]
+
+        # Tool arguments arrive as JSON, so dates come in as ISO strings
+        kwargs = {
+            key: date.fromisoformat(value) if key.endswith('_date') and isinstance(value, str) else value
+            for key, value in args.items()
+        }
+
+        return await asyncio.to_thread(self._run_agent, agent_attr, **kwargs)
+
+    def _run_agent(self, agent_attr: str, **kwargs) -> str:
+        """Run a sub-agent's execute(), reusing a cached result for identical arguments"""
+        return self._agent_cache.get_or_compute(
+            agent_attr,
+            lambda: getattr(self, agent_attr).execute(**kwargs),
+            **kwargs
+        )
+
+    async def _query_inventory_variants(self, medications: list) -> list:
+        """Query inventory for several medications in parallel, preserving order"""
+        results = await asyncio.gather(*(
+            asyncio.to_thread(self.data_tools._query_inventory_impl, medication=med)
+            for med in medications
+        ))
+        return list(results)
+
+    def _agui_batch(self):
+        """Batch AG-UI emission for the current request (no-op when AG-UI is off)"""
+        return self.agui.batch() if self.agui else nullcontext()
+
     async def _try_direct_query_with_agui(self, prompt: str) -> Optional[str]:
         """
         Try to handle simple data queries directly without agent.
@@ -881,383 +1555,311 @@ Always choose the most efficient path: use tools for simple queries, use agents
         Returns None if this requires agent processing.
         """
         prompt_lower = prompt.lower()
+        tags = _scan_intents(prompt_lower)
+        routes = _direct_query_routes(tags)
+
+        # Handlers run in priority order; a handler returns None to fall through.
+        # Quick lookups flush their AG-UI messages once; the LLM route streams.
+        for route, handler in self._direct_query_handlers.items():
+            if route in routes:
+                with self._agui_batch() if route != "LLM_DATA_QUERY" else nullcontext():
+                    result = await handler(prompt, prompt_lower, tags)
+                if result is not None:
+                    return result
 
-        # Patient history queries - flexible pattern matching
-        patient_query_patterns = [
-            "patient history",
-            "prescription history",
-            "medicines has patient",
-            "medications has patient",
-            "what has patient",
-            "patient.*taken",
-            "patient.*prescriptions",
-            "patient.*medications"
-        ]
+        return None
 
-        if any(pattern in prompt_lower for pattern in patient_query_patterns) or \
-           (("patient" in prompt_lower) and any(word in prompt_lower for word in ["medicines", "medications", "taken", "prescriptions"])):
-            # Check if query ALSO asks for inventory - if so, skip this handler and use intelligent agent
-            if "inventory" in prompt_lower or "stock" in prompt_lower:
-                # Fall through to intelligent query agent which handles multi-step queries
-                pass
-            elif "patient" in prompt_lower:
-                words = prompt.split()
-                for i, word in enumerate(words):
-                    if word.lower() == "patient" and i + 1 < len(words):
-                        patient_id = words[i + 1].strip('.,!?')
-
-                        if self.agui:
-                            self.agui.status(
-                                agent="DataQueryTools",
-                                message=f"Retrieving prescription history for patient {patient_id}...",
-                                status=AgentStatus.WORKING
-                            )
-
-                        result = self.data_tools.query_patient_history(patient_id)
-
-                        if self.agui:
-                            self.agui.result(
-                                agent="DataQueryTools",
-                                summary=result,  # Include the full formatted response in summary
-                                details={"formatted_response": result},
-                                reasoning="Found prescription records in database"
-                            )
-
-                        return result
-
-        # Inventory queries - multiple patterns
-        inventory_keywords = ["inventory", "stock", "supply", "supplies"]
-        is_inventory_query = any(keyword in prompt_lower for keyword in inventory_keywords) and "forecast" not in prompt_lower
-
-        # Also match queries about low stock, running low, etc.
-        if not is_inventory_query:
-            low_stock_patterns = ["low stock", "running low", "below", "less than", "under"]
-            if any(pattern in prompt_lower for pattern in low_stock_patterns):
-                is_inventory_query = True
-
-        if is_inventory_query:
-            # Check for medication name (allow partial matches)
-            matched_meds = []
-            for med in self.data_tools.medication_db['medication'].unique():
-                # Extract base medication name (before dosage)
-                base_med = med.split()[0].lower()
-                # Check if base name or full name appears in prompt
-                if base_med in prompt_lower or med.lower() in prompt_lower:
-                    matched_meds.append(med)
-
-            # If we found matching medications, query inventory for all of them
-            if matched_meds:
-                if self.agui:
-                    med_list = ", ".join(matched_meds)
-                    self.agui.status(
-                        agent="DataQueryTools",
-                        message=f"Checking inventory levels for {med_list}...",
-                        status=AgentStatus.WORKING
-                    )
+    async def _handle_patient_history(self, prompt: str, prompt_lower: str, tags: set) -> Optional[str]:
+        """Patient prescription history lookup"""
+        match = _PATIENT_ID_RE.search(prompt)
+        if not match:
+            return None
 
-                # Query inventory for the matched medications
-                all_results = []
-                total_qty = 0
-                total_value = 0.0
-
-                for med in matched_meds:
-                    result = self.data_tools.query_inventory(medication=med)
-                    result_data = json.loads(result)
-                    all_results.append(result_data)
-                    total_qty += result_data.get('total_quantity', 0)
-                    total_value += result_data.get('total_value', 0)
-
-                # Format response
-                response = f"## 📦 Inventory for {matched_meds[0].split()[0] if len(matched_meds) > 0 else 'Medications'}\n\n"
-
-                for med_result in all_results:
-                    med_name = med_result.get('medication', 'Unknown')
-                    qty = med_result.get('total_quantity', 0)
-                    value = med_result.get('total_value', 0)
-                    lots = med_result.get('lot_count', 0)
-
-                    response += f"**{med_name}:**\n"
-                    response += f"- Current stock: {qty} units\n"
-                    response += f"- Total value: ${value:.2f}\n"
-                    response += f"- Lot count: {lots}\n\n"
-
-                if len(matched_meds) > 1:
-                    response += f"**Total across all variants:**\n"
-                    response += f"- Combined stock: {total_qty} units\n"
-                    response += f"- Combined value: ${total_value:.2f}\n"
+        patient_id = match.group(1)
 
-                if self.agui:
-                    self.agui.result(
-                        agent="DataQueryTools",
-                        summary=response,
-                        details={"formatted_response": response},
-                        reasoning=f"Found {len(matched_meds)} medication variant(s)"
-                    )
+        if self.agui:
+            self.agui.status(
+                agent="DataQueryTools",
+                message=f"Retrieving prescription history for patient {patient_id}...",
+                status=AgentStatus.WORKING
+            )
 
-                return response
+        result = self.data_tools.query_patient_history(patient_id)
 
-            # Check for threshold-based queries (e.g., "below 10 units", "less than 50")
-            import re
-            threshold_match = re.search(r'(?:below|under|less than)\s+(\d+)', prompt_lower)
-            if threshold_match:
-                threshold = int(threshold_match.group(1))
+        if self.agui:
+            self.agui.result(
+                agent="DataQueryTools",
+                summary=f"Prescription history for patient {patient_id}",
+                details={"formatted_response": result},
+                reasoning="Found prescription records in database"
+            )
 
-                if self.agui:
-                    self.agui.status(
-                        agent="DataQueryTools",
-                        message=f"Finding medications with stock below {threshold} units...",
-                        status=AgentStatus.WORKING
-                    )
+        return result
 
-                # Check all medications
-                low_stock_items = []
-                for med in self.data_tools.medication_db['medication'].unique():
-                    result = self.data_tools.query_inventory(medication=med)
-                    result_data = json.loads(result)
-                    qty = result_data.get('total_quantity', 0)
-                    if qty < threshold:
-                        low_stock_items.append({
-                            'medication': med,
-                            'quantity': qty,
-                            'value': result_data.get('total_value', 0),
-                            'lots': result_data.get('lot_count', 0)
-                        })
-
-                # Format response
-                response = f"## 📦 Medications with Stock Below {threshold} Units\n\n"
-
-                if low_stock_items:
-                    response += f"Found **{len(low_stock_items)} medications** with stock below {threshold} units:\n\n"
-
-                    # Sort by quantity (lowest first)
-                    low_stock_items.sort(key=lambda x: x['quantity'])
-
-                    for item in low_stock_items:
-                        response += f"**{item['medication']}**\n"
-                        response += f"- Current stock: {item['quantity']} units\n"
-                        response += f"- Value: ${item['value']:.2f}\n"
-                        response += f"- Lots: {item['lots']}\n\n"
-
-                    # Add summary
-                    total_value = sum(item['value'] for item in low_stock_items)
-                    response += f"**Total value of low-stock items:** ${total_value:,.2f}\n"
-                else:
-                    response += f"✅ No medications found with stock below {threshold} units.\n"
-                    response += f"All inventory levels are above the threshold."
+    async def _handle_inventory_match(self, prompt: str, prompt_lower: str, tags: set) -> Optional[str]:
+        """Inventory for medications named in the prompt (base name or full name)"""
+        # Check for medication name (any variant whose base name appears in the prompt)
+        matched_meds = self.data_tools.match_medications(prompt_lower)
 
-                if self.agui:
-                    self.agui.result(
-                        agent="DataQueryTools",
-                        summary=f"Found {len(low_stock_items)} medications with stock below {threshold} units",
-                        details={"formatted_response": response},
-                        reasoning=f"Checked all medications in inventory against threshold of {threshold} units"
-                    )
+        if not matched_meds:
+            return None
 
-                return response
+        # Query inventory for all matched medications
+        if self.agui:
+            med_list = ", ".join(matched_meds)
+            self.agui.status(
+                agent="DataQueryTools",
+                message=f"Checking inventory levels for {med_list}...",
+                status=AgentStatus.WORKING
+            )
 
-            # Check for category
-            for cat in self.data_tools.medication_db['category'].unique():
-                if cat.lower() in prompt_lower:
-                    if self.agui:
-                        self.agui.status(
-                            agent="DataQueryTools",
-                            message=f"Retrieving inventory for {cat} category...",
-                            status=AgentStatus.WORKING
-                        )
+        # Pull the matched medications from the precomputed summary
+        summary = self.data_tools.inventory_summary()
+        matched = summary[summary['medication'].isin(matched_meds)]
+        total_qty = int(matched['total_quantity'].sum())
+        total_value = float(matched['total_value'].sum())
 
-                    result = self.data_tools.query_inventory(category=cat)
-                    result_data = json.loads(result)
+        # Format response
+        parts = [f"## 📦 Inventory for {matched_meds[0].split()[0] if len(matched_meds) > 0 else 'Medications'}\n\n"]
 
-                    if self.agui:
-                        self.agui.result(
-                            agent="DataQueryTools",
-                            summary=f"{result_data.get('medication_count', 0)} medications in {cat} category",
-                            details=result_data,
-                            reasoning=f"Total inventory value: ${result_data.get('total_value', 0):.2f}"
-                        )
+        for med_name, qty, value, lots in matched.itertuples(index=False, name=None):
+            parts.append(f"**{med_name}:**\n")
+            parts.append(f"- Current stock: {qty} units\n")
+            parts.append(f"- Total value: ${value:.2f}\n")
+            parts.append(f"- Lot count: {lots}\n\n")
 
-                    return result
+        if len(matched_meds) > 1:
+            parts.append(f"**Total across all variants:**\n")
+            parts.append(f"- Combined stock: {total_qty} units\n")
+            parts.append(f"- Combined value: ${total_value:.2f}\n")
 
-        # Top/bottom customers/patients queries
-        top_patterns = ["top", "top-", "bottom", "bottom-"]
-        customer_patterns = ["customer", "customers", "patient", "patients"]
-        order_patterns = [
-            "most orders", "most prescriptions", "most refills",
-            "highest orders", "highest prescriptions",
-            "least orders", "least prescriptions", "fewest orders",
-            "fewest prescriptions", "lowest orders", "lowest prescriptions"
-        ]
+        response = "".join(parts)
 
-        is_top_query = any(pattern in prompt_lower for pattern in top_patterns) and \
-                       any(pattern in prompt_lower for pattern in customer_patterns) and \
-                       any(pattern in prompt_lower for pattern in order_patterns)
+        if self.agui:
+            self.agui.result(
+                agent="DataQueryTools",
+                summary=f"Inventory for {len(matched_meds)} medication variant(s)",
+                details={"formatted_response": response},
+                reasoning=f"Found {len(matched_meds)} medication variant(s)"
+            )
 
-        if is_top_query:
-            # Extract the number (default to 10)
-            import re
-            top_match = re.search(r'(?:top|bottom)[-\s]*(\d+)', prompt_lower)
-            top_n = int(top_match.group(1)) if top_match else 10
+        return response
 
-            # Determine sort order (ascending for "least/fewest/lowest", descending for "most/highest")
-            least_patterns = ["least", "fewest", "lowest", "bottom"]
-            ascending = any(pattern in prompt_lower for pattern in least_patterns)
+    async def _handle_threshold(self, prompt: str, prompt_lower: str, tags: set) -> Optional[str]:
+        """Medications with stock below a threshold (e.g., "below 10 units", "less than 50")"""
+        threshold_match = _THRESHOLD_RE.search(prompt_lower)
+        if not threshold_match:
+            return None
 
-            # Check if user wants dates
-            include_dates = "date" in prompt_lower or "dates" in prompt_lower or "when" in prompt_lower
+        threshold = int(threshold_match.group(1))
 
-            sort_label = "fewest" if ascending else "most"
-            if self.agui:
-                extra_info = " with dates" if include_dates else ""
-                self.agui.status(
-                    agent="DataQueryTools",
-                    message=f"Finding top {top_n} customers with {sort_label} orders{extra_info}...",
-                    status=AgentStatus.WORKING
-                )
+        if self.agui:
+            self.agui.status(
+                agent="DataQueryTools",
+                message=f"Finding medications with stock below {threshold} units...",
+                status=AgentStatus.WORKING
+            )
 
-            # Count prescriptions per patient
-            patient_counts = self.data_tools.prescription_data.groupby('patient_id').size().reset_index(name='order_count')
-            patient_counts = patient_counts.sort_values('order_count', ascending=ascending).head(top_n)
-
-            # Get additional patient details
-            patient_details = []
-            for _, row in patient_counts.iterrows():
-                patient_id = row['patient_id']
-                order_count = row['order_count']
-
-                # Get unique medications for this patient
-                patient_prescriptions = self.data_tools.prescription_data[
-                    self.data_tools.prescription_data['patient_id'] == patient_id
-                ]
-                unique_meds = patient_prescriptions['medication'].nunique()
-                total_quantity = patient_prescriptions['quantity'].sum()
-
-                detail = {
-                    'patient_id': patient_id,
-                    'order_count': order_count,
-                    'unique_medications': unique_meds,
-                    'total_quantity': total_quantity
-                }
+        # Check all medications in one vectorized filter, lowest stock first
+        low_stock = self.data_tools.inventory_below(threshold)
+        low_stock_count = len(low_stock)
 
-                # Include order dates if requested
-                if include_dates:
-                    order_dates = patient_prescriptions['fill_date'].tolist()
-                    detail['order_dates'] = order_dates
-
-                patient_details.append(detail)
-
-            # Format response
-            rank_label = f"Top {top_n} Customers with {sort_label.title()} Orders"
-            response = f"## 👥 {rank_label}\n\n"
-            response += f"**Total customers analyzed:** {self.data_tools.prescription_data['patient_id'].nunique()}\n\n"
-
-            for i, patient in enumerate(patient_details, 1):
-                response += f"**{i}. Patient {patient['patient_id']}**\n"
-                response += f"   - Total orders: {patient['order_count']}\n"
-                response += f"   - Unique medications: {patient['unique_medications']}\n"
-                response += f"   - Total quantity dispensed: {patient['total_quantity']} units\n"
-
-                # Include order dates if requested
-                if include_dates and 'order_dates' in patient:
-                    response += f"   - Order dates:\n"
-                    # Sort dates and show them
-                    dates = sorted(patient['order_dates'])
-                    # Show first 10 dates, then indicate if there are more
-                    for date in dates[:10]:
-                        response += f"      • {date}\n"
-                    if len(dates) > 10:
-                        response += f"      • ... and {len(dates) - 10} more dates\n"
-
-                response += "\n"
+        # Format response
+        parts = [f"## 📦 Medications with Stock Below {threshold} Units\n\n"]
 
-            if self.agui:
-                self.agui.result(
-                    agent="DataQueryTools",
-                    summary=response,
-                    details={"formatted_response": response},
-                    reasoning=f"Analyzed {self.data_tools.prescription_data['patient_id'].nunique()} patients and ranked by {sort_label} orders"
-                )
+        if low_stock_count:
+            parts.append(f"Found **{low_stock_count} medications** with stock below {threshold} units:\n\n")
 
-            return response
+            for med, qty, value, lots in low_stock.itertuples(index=False, name=None):
+                parts.append(f"**{med}**\n")
+                parts.append(f"- Current stock: {qty} units\n")
+                parts.append(f"- Value: ${value:.2f}\n")
+                parts.append(f"- Lots: {lots}\n\n")
 
-        # Medication info queries
-        if "tell me about" in prompt_lower or "information about" in prompt_lower:
-            for med in self.data_tools.medication_db['medication'].unique():
-                if med.lower() in prompt_lower:
-                    if self.agui:
-                        self.agui.status(
-                            agent="DataQueryTools",
-                            message=f"Gathering information about {med}...",
-                            status=AgentStatus.WORKING
-                        )
+            # Add summary
+            total_value = float(low_stock['total_value'].sum())
+            parts.append(f"**Total value of low-stock items:** ${total_value:,.2f}\n")
+        else:
+            parts.append(f"✅ No medications found with stock below {threshold} units.\n")
+            parts.append(f"All inventory levels are above the threshold.")
 
-                    result = self.data_tools.query_medication_info(med)
-                    result_data = json.loads(result)
+        response = "".join(parts)
 
-                    if self.agui:
-                        self.agui.result(
-                            agent="DataQueryTools",
-                            summary=f"{med}: {result_data.get('total_patients', 0)} patients, {result_data.get('current_stock', 0)} units in stock",
-                            details=result_data
-                        )
+        if self.agui:
+            self.agui.result(
+                agent="DataQueryTools",
+                summary=f"Found {low_stock_count} medications with stock below {threshold} units",
+                details={"formatted_response": response},
+                reasoning=f"Checked all medications in inventory against threshold of {threshold} units"
+            )
 
-                    return result
+        return response
 
-        # List categories
-        if "list categories" in prompt_lower or "what categories" in prompt_lower:
-            if self.agui:
-                self.agui.status(
-                    agent="DataQueryTools",
-                    message="Retrieving medication categories...",
-                    status=AgentStatus.WORKING
-                )
+    async def _handle_category(self, prompt: str, prompt_lower: str, tags: set) -> Optional[str]:
+        """Inventory for a medication category named in the prompt"""
+        cat = self.data_tools.find_category(prompt_lower)
+        if not cat:
+            return None
 
-            result = self.data_tools.list_categories()
-            result_data = json.loads(result)
+        if self.agui:
+            self.agui.status(
+                agent="DataQueryTools",
+                message=f"Retrieving inventory for {cat} category...",
+                status=AgentStatus.WORKING
+            )
 
-            if self.agui:
-                self.agui.result(
-                    agent="DataQueryTools",
-                    summary=f"Found {result_data.get('total_categories', 0)} medication categories",
-                    details=result_data
-                )
+        result_data = self.data_tools._query_inventory_impl(category=cat)
+        result = _dumps(result_data)
 
-            return result
+        if self.agui:
+            self.agui.result(
+                agent="DataQueryTools",
+                summary=f"{result_data.get('medication_count', 0)} medications in {cat} category",
+                details=result_data,
+                reasoning=f"Total inventory value: ${result_data.get('total_value', 0):.2f}"
+            )
 
-        # Try intelligent LLM-powered query agent for data queries
-        # This handles varied queries without hardcoded patterns
-        # Skip if query is asking for forecasting/optimization/analysis
-        skip_keywords = ["forecast", "predict", "analyze", "analysis", "refill pattern", "order recommendation", "optimization", "optimize"]
-        if not any(keyword in prompt_lower for keyword in skip_keywords):
-            # Check if this looks like a data query
-            data_query_keywords = ["top", "bottom", "list", "show", "display", "which", "who", "what", "how many", "customer", "patient", "medication"]
-            if any(keyword in prompt_lower for keyword in data_query_keywords):
-                if self.agui:
-                    self.agui.status(
-                        agent="IntelligentDataQueryAgent",
-                        message="Using LLM to intelligently analyze and answer your query...",
-                        status=AgentStatus.WORKING
-                    )
+        return result
 
-                try:
-                    result = await self.intelligent_query_agent.query_async(prompt)
+    async def _handle_topn(self, prompt: str, prompt_lower: str, tags: set) -> Optional[str]:
+        """Top/bottom customers ranked by order count"""
+        # Extract the number (default to 10)
+        top_match = _RANK_NUM_RE.search(prompt_lower)
+        top_n = int(top_match.group(1)) if top_match else 10
 
-                    if self.agui:
-                        self.agui.result(
-                            agent="IntelligentDataQueryAgent",
-                            summary=result,
-                            details={"formatted_response": result},
-                            reasoning="LLM-powered analysis completed"
-                        )
+        # Determine sort order (ascending for "least/fewest/lowest", descending for "most/highest")
+        ascending = "ASCENDING" in tags
 
-                    return result
+        # Check if user wants dates
+        include_dates = "DATES" in tags
 
-                except Exception as e:
-                    self.logger.error(f"Error in intelligent query agent: {e}")
-                    # Continue to full pipeline if intelligent agent fails
+        sort_label = "fewest" if ascending else "most"
+        if self.agui:
+            extra_info = " with dates" if include_dates else ""
+            self.agui.status(
+                agent="DataQueryTools",
+                message=f"Finding top {top_n} customers with {sort_label} orders{extra_info}...",
+                status=AgentStatus.WORKING
+            )
 
-        return None
+        # Rank from the cached per-patient aggregates
+        patient_summary = self.data_tools.patient_summary
+        total_customers = len(patient_summary)
+        patient_counts = patient_summary.sort_values('order_count', ascending=ascending).head(top_n)
+
+        # Format response
+        rank_label = f"Top {top_n} Customers with {sort_label.title()} Orders"
+        parts = [f"## 👥 {rank_label}\n\n"]
+        parts.append(f"**Total customers analyzed:** {total_customers}\n\n")
+
+        for i, patient in enumerate(patient_counts.itertuples(index=False), 1):
+            parts.append(f"**{i}. Patient {patient.patient_id}**\n")
+            parts.append(f"   - Total orders: {patient.order_count}\n")
+            parts.append(f"   - Unique medications: {patient.unique_medications}\n")
+            parts.append(f"   - Total quantity dispensed: {patient.total_quantity} units\n")
+
+            # Include order dates if requested
+            if include_dates:
+                parts.append(f"   - Order dates:\n")
+                # Cached dates are already sorted
+                dates = self.data_tools.patient_order_dates[patient.patient_id]
+                # Show first 10 dates, then indicate if there are more
+                for date in dates[:10]:
+                    parts.append(f"      • {date}\n")
+                if len(dates) > 10:
+                    parts.append(f"      • ... and {len(dates) - 10} more dates\n")
+
+            parts.append("\n")
+
+        response = "".join(parts)
+
+        if self.agui:
+            self.agui.result(
+                agent="DataQueryTools",
+                summary=rank_label,
+                details={"formatted_response": response},
+                reasoning=f"Analyzed {total_customers} patients and ranked by {sort_label} orders"
+            )
+
+        return response
+
+    async def _handle_medinfo(self, prompt: str, prompt_lower: str, tags: set) -> Optional[str]:
+        """Medication details for a medication named in the prompt"""
+        med = self.data_tools.find_medication(prompt_lower)
+        if not med:
+            return None
+
+        if self.agui:
+            self.agui.status(
+                agent="DataQueryTools",
+                message=f"Gathering information about {med}...",
+                status=AgentStatus.WORKING
+            )
+
+        result_data = self.data_tools._query_medication_info_impl(med)
+        result = _dumps(result_data)
+
+        if self.agui:
+            self.agui.result(
+                agent="DataQueryTools",
+                summary=f"{med}: {result_data.get('total_patients', 0)} patients, {result_data.get('current_stock', 0)} units in stock",
+                details=result_data
+            )
+
+        return result
+
+    async def _handle_list_categories(self, prompt: str, prompt_lower: str, tags: set) -> Optional[str]:
+        """List medication categories"""
+        if self.agui:
+            self.agui.status(
+                agent="DataQueryTools",
+                message="Retrieving medication categories...",
+                status=AgentStatus.WORKING
+            )
+
+        result_data = self.data_tools._list_categories_impl()
+        result = _dumps(result_data)
+
+        if self.agui:
+            self.agui.result(
+                agent="DataQueryTools",
+                summary=f"Found {result_data.get('total_categories', 0)} medication categories",
+                details=result_data
+            )
+
+        return result
+
+    async def _handle_llm_data_query(self, prompt: str, prompt_lower: str, tags: set) -> Optional[str]:
+        """
+        Intelligent LLM-powered query agent for data queries.
+        Handles varied queries without hardcoded patterns.
+        """
+        if self.agui:
+            self.agui.status(
+                agent="IntelligentDataQueryAgent",
+                message="Using LLM to intelligently analyze and answer your query...",
+                status=AgentStatus.WORKING
+            )
+
+        try:
+            result = await self.intelligent_query_agent.query_async(prompt)
+
+            if self.agui:
+                self.agui.result(
+                    agent="IntelligentDataQueryAgent",
+                    summary="Data query answered",
+                    details={"formatted_response": result},
+                    reasoning="LLM-powered analysis completed"
+                )
+
+            return result
+
+        except Exception as e:
+            self.logger.error(f"Error in intelligent query agent: {e}")
+            # Continue to full pipeline if intelligent agent fails
+            return None
 
-    async def _route_to_agent_with_agui(self, prompt: str) -> tuple[str, Any]:
+    async def _route_to_agent_with_agui(self, prompt: str) -> tuple[str, AgentResult]:
         """
         Route prompt to appropriate agent with AG-UI messaging.
         Returns (agent_type, result)
@@ -1265,113 +1867,66 @@ Always choose the most efficient path: use tools for simple queries, use agents
         prompt_lower = prompt.lower()
 
         # Handle conditional queries (e.g., "Check X, if < Y, then do Z")
-        if ("if" in prompt_lower or "if below" in prompt_lower or "if above" in prompt_lower) and \
-           "inventory" in prompt_lower and ("forecast" in prompt_lower or "order" in prompt_lower):
+        if _CONDITIONAL_RE.match(prompt_lower):
 
             # Extract medication name and threshold
-            import re
-
-            # Try to find medication name
-            medication = None
-            for med in self.data_tools.medication_db['medication'].unique():
-                base_med = med.split()[0].lower()
-                if base_med in prompt_lower:
-                    medication = base_med
-                    break
+            medication = self.data_tools.find_base_medication(prompt_lower)
 
             # Try to find threshold number
-            threshold_match = re.search(r'(\d+[,\d]*)', prompt)
+            threshold_match = _NUMBER_RE.search(prompt)
             threshold = int(threshold_match.group(1).replace(',', '')) if threshold_match else 2500
 
             if medication:
+                med_title = medication.title()
+
                 # Check inventory first
                 if self.agui:
                     self.agui.status(
                         agent="DataQueryTools",
-                        message=f"Checking {medication.title()} inventory levels...",
+                        message=_MSG_INV_CHECK.format(med=med_title),
                         status=AgentStatus.WORKING
                     )
 
                 # Find matching medications
-                matched_meds = []
-                for med in self.data_tools.medication_db['medication'].unique():
-                    base_med = med.split()[0].lower()
-                    if base_med == medication:
-                        matched_meds.append(med)
+                matched_meds = self.data_tools._base_to_full[medication]
 
                 # Query inventory
-                total_qty = 0
-                total_value = 0.0
-                for med in matched_meds:
-                    result = self.data_tools.query_inventory(medication=med)
-                    result_data = json.loads(result)
-                    total_qty += result_data.get('total_quantity', 0)
-                    total_value += result_data.get('total_value', 0)
-
-                # Format initial response
-                response = f"## 📦 Inventory Check: {medication.title()}\n\n"
-                response += f"**Current inventory:** {total_qty:,} units\n"
-                response += f"**Total value:** ${total_value:,.2f}\n"
-                response += f"**Variants:** {len(matched_meds)}\n\n"
-
-                # Check condition
-                if total_qty < threshold:
-                    response += f"⚠️ **Condition met:** Inventory ({total_qty:,} units) is **below** the threshold of {threshold:,} units.\n\n"
-                    response += f"Proceeding with {medication.title()}-specific demand forecast and optimization analysis...\n\n"
-                    response += "---\n\n"
+                totals = self.data_tools.query_inventory_bulk(matched_meds)
+                total_qty = totals['total_quantity']
+                total_value = totals['total_value']
 
-                    # Run analysis pipeline for medication-specific insights
+                # Run analysis pipeline for medication-specific insights
+                analysis_result = None
+                if total_qty < threshold:
                     if self.agui:
                         self.agui.status(
                             agent="AnalysisPipeline",
-                            message=f"Running patient analysis and external signals collection...",
+                            message=_MSG_PIPELINE_START,
                             status=AgentStatus.WORKING
                         )
                         self.agui.status(
                             agent="ForecastingAgent",
-                            message=f"Forecasting {medication.title()} demand for next 30 days...",
+                            message=_MSG_MED_FORECAST.format(med=med_title),
                             status=AgentStatus.WORKING
                         )
 
-                    # For medication-specific analysis, show focused results
-                    response += f"## 📊 {medication.title()} Demand Forecast & Optimization\n\n"
-
-                    # Run full pipeline (needed for accurate forecasting)
-                    analysis_result = self.complete_agent.execute()
-
-                    # Extract medication-specific insights from the analysis
-                    # Since parsing complex markdown is difficult, provide a focused summary
-                    response += f"### 📈 Forecasted Demand\n"
-                    response += f"*Based on patient refill patterns, flu activity, and weather data*\n\n"
-                    response += f"- **Medication:** {medication.title()} (all variants)\n"
-                    response += f"- **Current stock:** {total_qty:,} units\n"
-                    response += f"- **Analysis period:** Next 30 days\n"
-                    response += f"- **External factors:** Flu season, weather patterns, patient behavior\n\n"
-
-                    response += f"### 🎯 Recommendation\n\n"
-                    response += f"The full analysis is running to determine optimal order quantity for {medication.title()}. "
-                    response += f"This considers:\n"
-                    response += f"- Patient refill predictions (394 patient-medication profiles analyzed)\n"
-                    response += f"- Flu activity impact (current level affecting demand)\n"
-                    response += f"- Economic Order Quantity (EOQ) optimization\n"
-                    response += f"- Safety stock calculations (7-day buffer)\n\n"
-
-                    response += f"**Full analysis results:**\n\n"
-                    response += analysis_result
-
-                    response += f"\n\n---\n\n"
-                    response += f"💡 **Note:** The analysis shows all medications for context, but focus on {medication.title()} entries in the forecast and critical orders sections."
-                else:
-                    response += f"✅ **Condition not met:** Inventory ({total_qty:,} units) is **above** the threshold of {threshold:,} units.\n\n"
-                    response += f"No action needed. Current stock levels are sufficient."
+                    # Run the pipeline scoped to this medication's variants only
+                    analysis_result = await asyncio.to_thread(
+                        self._run_agent, "complete_agent", medication_filter=medication
+                    )
+
+                response = _format_conditional_response(
+                    med_title, total_qty, total_value, matched_meds, threshold, analysis_result
+                )
 
                 # Don't emit AG-UI result here - it will be emitted in process_request
                 # when it detects the formatted markdown response
 
-                return "conditional_query", response
+                return "conditional_query", AgentResult(kind="markdown", text=response)
 
         # Determine agent type
-        if any(keyword in prompt_lower for keyword in ["analyze", "patient", "refill", "behavior"]):
+        tokens = frozenset(_TOKEN_RE.findall(prompt_lower))
+        if tokens & _PATIENT_KWS:
             agent_type = "patient_analysis"
             agent_name = "PatientAnalysisAgent"
 
@@ -1382,34 +1937,23 @@ Always choose the most efficient path: use tools for simple queries, use agents
                     status=AgentStatus.WORKING
                 )
 
-            result = self.patient_agent.execute()
-            # Handle both JSON and formatted markdown responses
-            try:
-                result_data = json.loads(result) if result and not result.strip().startswith("##") else {"formatted_response": result}
-            except json.JSONDecodeError:
-                result_data = {"formatted_response": result}
-
+            result = await asyncio.to_thread(self._run_agent, "patient_agent")
             # Don't emit AG-UI result here - it will be emitted in process_request
             # to avoid duplicate rendering
 
-            return agent_type, result
+            return agent_type, AgentResult(kind="markdown", text=result)
 
-        elif any(keyword in prompt_lower for keyword in ["forecast", "predict", "demand"]) and "order" not in prompt_lower:
+        elif tokens & _FORECAST_KWS and not tokens & _ORDER_KWS:
             agent_type = "forecasting"
             agent_name = "ForecastingAgent"
 
             # Parse date from query (e.g., "March 2026", "next 60 days", "for April")
-            import re
-            from dateutil import parser
-            from datetime import datetime, timedelta
-            import calendar
-
             target_month_date = None  # The month/date we want to forecast FOR
             forecast_start_date = None  # When to start the forecast (defaults to today)
             forecast_days = 30  # default
 
             # Try to extract specific date mentions (e.g., "March 2026", "April 2025")
-            month_year_match = re.search(r'(january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{4})', prompt_lower)
+            month_year_match = _MONTH_YEAR_RE.search(prompt_lower)
             if month_year_match:
                 month_name = month_year_match.group(1).capitalize()
                 year = int(month_year_match.group(2))
@@ -1432,16 +1976,12 @@ Always choose the most efficient path: use tools for simple queries, use agents
                     forecast_days = 30
 
             # Try to extract "next X days" or "X days"
-            days_match = re.search(r'(?:next\s+)?(\d+)\s+days?', prompt_lower)
+            days_match = _DAYS_RE.search(prompt_lower)
             if days_match:
                 forecast_days = int(days_match.group(1))
 
             # Try to extract category filter
-            category_filter = None
-            for cat in self.data_tools.medication_db['category'].unique():
-                if cat.lower() in prompt_lower:
-                    category_filter = cat
-                    break
+            category_filter = self.data_tools.find_category(prompt_lower)
 
             if self.agui:
                 if target_month_date and target_month_date > date.today():
@@ -1465,21 +2005,17 @@ Always choose the most efficient path: use tools for simple queries, use agents
                     status=AgentStatus.WORKING
                 )
 
-            result = self.forecasting_agent.execute(
+            result = await asyncio.to_thread(
+                self._run_agent,
+                "forecasting_agent",
                 forecast_days=forecast_days,
                 target_date=forecast_start_date,
                 category_filter=category_filter
             )
-            # Handle both JSON and formatted markdown responses
-            try:
-                result_data = json.loads(result) if result and not result.strip().startswith("##") else {"formatted_response": result}
-            except json.JSONDecodeError:
-                result_data = {"formatted_response": result}
-
             # Don't emit AG-UI result here - it will be emitted in process_request
             # to avoid duplicate rendering
 
-            return agent_type, result
+            return agent_type, AgentResult(kind="markdown", text=result)
 
         else:
             # Complete analysis with optimization
@@ -1508,17 +2044,11 @@ Always choose the most efficient path: use tools for simple queries, use agents
                     status=AgentStatus.WORKING
                 )
 
-            result = self.complete_agent.execute()
-            # Handle both JSON and formatted markdown responses
-            try:
-                result_data = json.loads(result) if result and not result.strip().startswith("##") else {"formatted_response": result}
-            except json.JSONDecodeError:
-                result_data = {"formatted_response": result}
-
+            result = await asyncio.to_thread(self._run_agent, "complete_agent")
             # Don't emit AG-UI result here - it will be emitted in process_request
             # to avoid duplicate rendering
 
-            return agent_type, result
+            return agent_type, AgentResult(kind="markdown", text=result)
 
     def _generate_suggestions(self, prompt: str, result_data: Any, query_type: str) -> Optional[Any]:
         """Generate contextual suggestions based on query type and results"""
@@ -1527,8 +2057,8 @@ Always choose the most efficient path: use tools for simple queries, use agents
 
         if isinstance(result_data, str):
             try:
-                result_data = json.loads(result_data)
-            except:
+                result_data = orjson.loads(result_data)
+            except orjson.JSONDecodeError:
                 return None
 
         suggestions = []
@@ -1537,16 +2067,8 @@ Always choose the most efficient path: use tools for simple queries, use agents
             # For simple queries
             prompt_lower = prompt.lower()
             if "inventory" in prompt_lower:
-                med = None
-                cat = None
-                for m in self.data_tools.medication_db['medication'].unique():
-                    if m.lower() in prompt_lower:
-                        med = m
-                        break
-                for c in self.data_tools.medication_db['category'].unique():
-                    if c.lower() in prompt_lower:
-                        cat = c
-                        break
+                med = self.data_tools.find_medication(prompt_lower)
+                cat = self.data_tools.find_category(prompt_lower)
                 suggestions = SuggestionGenerator.generate_for_inventory_query(medication=med, category=cat)
 
         elif query_type == "patient_analysis":
@@ -1584,19 +2106,14 @@ Always choose the most efficient path: use tools for simple queries, use agents
 
     def _extract_response_text(self, response) -> str:
         """Extract text from ADK response"""
-        if hasattr(response, 'text'):
-            return response.text
-        elif isinstance(response, dict) and 'text' in response:
-            return response['text']
-        elif isinstance(response, str):
-            return response
-        else:
-            return str(response)
+        return _extract_response_text(response)
 
     def run(self, user_prompt: str) -> Any:
         """
         Synchronous wrapper for process_request.
-        Uses nest_asyncio to handle nested event loops (required for Streamlit).
+        Runs with its own AG-UI handler so concurrent callers (e.g. several
+        Streamlit sessions sharing one orchestrator) never see each other's
+        messages. Callbacks fire on the calling thread.
 
         Args:
             user_prompt: Natural language user request
@@ -1605,5 +2122,17 @@ Always choose the most efficient path: use tools for simple queries, use agents
             Agent response
         """
         # nest_asyncio is applied at module level, so asyncio.run() will work
-        # even inside Streamlit's event loop
-        return asyncio.run(self.process_request(user_prompt))
+        return asyncio.run(self._with_request_handler(self.process_request(user_prompt)))
+
+    def run_action(self, action: SuggestedAction) -> Any:
+        """
+        Synchronous wrapper for action_router.route_action.
+        Runs with its own AG-UI handler, like run().
+
+        Args:
+            action: Suggested follow-up action selected by the user
+
+        Returns:
+            Action response
+        """
+        return asyncio.run(self._with_request_handler(self.action_router.route_action(action)))
@@ -4,7 +4,7 @@ External Signals Data Schemas
 Defines data structures for external factors affecting pharmacy demand.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict
 from datetime import date, datetime
 from enum import Enum
@@ -19,8 +19,68 @@ class TrendDirection(str, Enum):
     RAPID_DECREASE = "rapid_decrease"
 
 
+def _flu_base_multiplier(level: int) -> float:
+    """Base antiviral demand multiplier for a flu activity level"""
+    # Level 1-3: normal demand
+    # Level 4-6: moderate increase
+    # Level 7-10: significant increase
+    if level <= 3:
+        return 1.0
+    elif level <= 6:
+        return 1.0 + (level - 3) * 0.15  # 1.15 to 1.45
+    else:
+        return 1.45 + (level - 6) * 0.20  # 1.65 to 2.25
+
+
+_FLU_TREND_ADJUSTMENT = {
+    TrendDirection.RAPID_INCREASE: 1.2,
+    TrendDirection.INCREASING: 1.1,
+    TrendDirection.STABLE: 1.0,
+    TrendDirection.DECREASING: 0.95,
+    TrendDirection.RAPID_DECREASE: 0.9
+}
+
+# Every (level, trend) combination is known up front, so precompute all 50 multipliers
+_FLU_DEMAND_TABLE = {
+    (level, trend): round(_flu_base_multiplier(level) * adjustment, 2)
+    for level in range(1, 11)
+    for trend, adjustment in _FLU_TREND_ADJUSTMENT.items()
+}
+
+
+def _cold_flu_multiplier(temp_bin: int, is_cold_snap: bool, humid: bool) -> float:
+    """Cold/flu multiplier for a temperature bin (0: <32F, 1: <45F, 2: warmer)"""
+    multiplier = 1.0
+
+    # Cold temperature effect
+    if temp_bin == 0:
+        multiplier += 0.3
+    elif temp_bin == 1:
+        multiplier += 0.15
+
+    # Cold snap effect (sudden drop)
+    if is_cold_snap:
+        multiplier += 0.2
+
+    # High humidity can increase respiratory issues
+    if humid:
+        multiplier += 0.05
+
+    return round(multiplier, 2)
+
+
+_COLD_FLU_TABLE = {
+    (temp_bin, is_cold_snap, humid): _cold_flu_multiplier(temp_bin, is_cold_snap, humid)
+    for temp_bin in range(3)
+    for is_cold_snap in (False, True)
+    for humid in (False, True)
+}
+
+
 class FluActivity(BaseModel):
     """Influenza activity data from EODY reports."""
+
+    model_config = ConfigDict(frozen=True)
     
     level: int = Field(
         ...,
@@ -56,31 +116,14 @@ class FluActivity(BaseModel):
         Returns:
             Multiplier (1.0 = normal, 2.0 = double demand, etc.)
         """
-        # Base multiplier from level
-        # Level 1-3: normal demand
-        # Level 4-6: moderate increase
-        # Level 7-10: significant increase
-        if self.level <= 3:
-            base = 1.0
-        elif self.level <= 6:
-            base = 1.0 + (self.level - 3) * 0.15  # 1.15 to 1.45
-        else:
-            base = 1.45 + (self.level - 6) * 0.20  # 1.65 to 2.25
-        
-        # Adjust for trend
-        trend_adjustment = {
-            TrendDirection.RAPID_INCREASE: 1.2,
-            TrendDirection.INCREASING: 1.1,
-            TrendDirection.STABLE: 1.0,
-            TrendDirection.DECREASING: 0.95,
-            TrendDirection.RAPID_DECREASE: 0.9
-        }
-        
-        return round(base * trend_adjustment[self.trend], 2)
+        # Base from level (1.0 / 1.15-1.45 / 1.65-2.25) adjusted for trend
+        return _FLU_DEMAND_TABLE[(self.level, self.trend)]
 
 
 class WeatherData(BaseModel):
     """Weather data affecting pharmacy demand."""
+
+    model_config = ConfigDict(frozen=True)
     
     temperature_avg_f: float = Field(
         ...,
@@ -125,27 +168,16 @@ class WeatherData(BaseModel):
         
         Cold weather increases cold/flu medication demand.
         """
-        multiplier = 1.0
-        
-        # Cold temperature effect
-        if self.temperature_avg_f < 32:
-            multiplier += 0.3
-        elif self.temperature_avg_f < 45:
-            multiplier += 0.15
-        
-        # Cold snap effect (sudden drop)
-        if self.is_cold_snap:
-            multiplier += 0.2
-        
-        # High humidity can increase respiratory issues
-        if self.humidity_percent > 80:
-            multiplier += 0.05
-        
-        return round(multiplier, 2)
+        temp = self.temperature_avg_f
+        temp_bin = 0 if temp < 32 else 1 if temp < 45 else 2
+
+        return _COLD_FLU_TABLE[(temp_bin, self.is_cold_snap, self.humidity_percent > 80)]
 
 
 class DrugShortage(BaseModel):
     """Information about a drug shortage."""
+
+    model_config = ConfigDict(frozen=True)
     
     medication: str = Field(
         ...,
@@ -171,6 +203,8 @@ class DrugShortage(BaseModel):
 
 class SupplyChainStatus(BaseModel):
     """Overall supply chain status."""
+
+    model_config = ConfigDict(frozen=True)
     
     shortages_detected: List[DrugShortage] = Field(
         default_factory=list,
@@ -188,6 +222,8 @@ class SupplyChainStatus(BaseModel):
 
 class LocalEvent(BaseModel):
     """Local event that may affect pharmacy demand."""
+
+    model_config = ConfigDict(frozen=True)
     
     event_name: str = Field(
         ...,
@@ -267,8 +303,9 @@ class ExternalSignals(BaseModel):
         
         return multipliers
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "flu_activity": {
                     "level": 7,
@@ -291,3 +328,4 @@ class ExternalSignals(BaseModel):
                 "data_quality": "complete"
             }
         }
+    )
@@ -4,10 +4,14 @@ Forecasting Schemas
 Data structures for medication demand forecasting.
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+import sys
+import numpy as np
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_serializer, field_validator
+from typing import List, Dict, FrozenSet, Optional, Tuple
 from datetime import date
-from enum import Enum
+from enum import Enum, IntEnum
+from functools import cached_property
 
 
 class ForecastMethod(str, Enum):
@@ -18,13 +22,29 @@ class ForecastMethod(str, Enum):
     SIMPLE_AVERAGE = "simple_average"
 
 
-class DemandAlert(str, Enum):
+class DemandAlert(IntEnum):
     """Alert types for demand forecasting."""
-    SPIKE = "spike"  # Unusual demand increase
-    DROP = "drop"  # Unusual demand decrease
-    SEASONAL_PEAK = "seasonal_peak"  # Expected seasonal high
-    SHORTAGE_RISK = "shortage_risk"  # Risk of running out
-    OVERSTOCK_RISK = "overstock_risk"  # Risk of excess inventory
+    SPIKE = 0  # Unusual demand increase
+    DROP = 1  # Unusual demand decrease
+    SEASONAL_PEAK = 2  # Expected seasonal high
+    SHORTAGE_RISK = 3  # Risk of running out
+    OVERSTOCK_RISK = 4  # Risk of excess inventory
+
+    @classmethod
+    def _missing_(cls, value):
+        # Accept the old string values ("spike", "shortage_risk", ...)
+        if isinstance(value, str):
+            return cls.__members__.get(value.upper())
+        return None
+
+    @property
+    def label(self) -> str:
+        """Lowercase name, as used in serialized output."""
+        return self.name.lower()
+
+
+# Alerts that flag a forecast as high risk
+_HIGH_RISK_ALERTS = frozenset({DemandAlert.SHORTAGE_RISK, DemandAlert.SPIKE})
 
 
 class MedicationForecast(BaseModel):
@@ -32,6 +52,8 @@ class MedicationForecast(BaseModel):
     Demand forecast for a single medication.
     """
 
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     medication: str = Field(..., description="Medication name")
     category: Optional[str] = Field(None, description="Medication category")
 
@@ -49,7 +71,32 @@ class MedicationForecast(BaseModel):
     # Metadata
     confidence: float = Field(..., ge=0, le=1, description="Forecast confidence (0-1)")
     method: ForecastMethod = Field(..., description="Forecasting method used")
-    alerts: List[DemandAlert] = Field(default_factory=list, description="Any alerts for this forecast")
+    alerts: FrozenSet[DemandAlert] = Field(default_factory=frozenset, description="Any alerts for this forecast")
+
+    @field_validator('medication', 'category')
+    @classmethod
+    def _intern_names(cls, v: Optional[str]) -> Optional[str]:
+        # Names repeat across every record; interning shares one string object
+        return sys.intern(str(v)) if v is not None else None
+
+    @field_serializer('alerts')
+    def _serialize_alerts(self, alerts: FrozenSet[DemandAlert]) -> List[str]:
+        return [alert.label for alert in sorted(alerts)]
+
+    @classmethod
+    def build_trusted(cls, **data) -> "MedicationForecast":
+        """
+        Construct without validation, for agent-internal data that already has
+        the right Python types (plain floats, dates, enum members).
+        Only the confidence range is checked; names are interned as in
+        validated construction.
+        """
+        if not 0 <= data['confidence'] <= 1:
+            raise ValueError(f"confidence must be in [0, 1], got {data['confidence']}")
+        data['medication'] = sys.intern(str(data['medication']))
+        if data.get('category') is not None:
+            data['category'] = sys.intern(str(data['category']))
+        return cls.model_construct(**data)
 
 
 class CategoryForecast(BaseModel):
@@ -129,26 +176,61 @@ class ForecastingResult(BaseModel):
     method: ForecastMethod = Field(..., description="Primary forecasting method")
     notes: List[str] = Field(default_factory=list, description="Any notes or warnings")
 
+    # Lookup indexes, built on first use. Call invalidate_indexes() after
+    # mutating medication_forecasts or category_forecasts in place.
+    _by_key: Optional[Dict[Tuple[str, date], MedicationForecast]] = PrivateAttr(default=None)
+    _cat_index: Optional[Dict[str, CategoryForecast]] = PrivateAttr(default=None)
+    _risk_mask: Optional[np.ndarray] = PrivateAttr(default=None)
+
+    def invalidate_indexes(self) -> None:
+        """Drop cached lookup indexes so they are rebuilt from the current lists."""
+        self._by_key = None
+        self._cat_index = None
+        self._risk_mask = None
+        self.__dict__.pop('total_forecasted_demand', None)
+
+    @cached_property
+    def total_forecasted_demand(self) -> float:
+        """Sum of predicted daily demand over all medication forecasts, computed once."""
+        return float(np.fromiter(
+            (f.predicted_demand for f in self.medication_forecasts),
+            dtype=np.float64,
+            count=len(self.medication_forecasts),
+        ).sum())
+
     def get_forecast_for_medication(self, medication: str, forecast_date: date) -> Optional[MedicationForecast]:
         """Get forecast for specific medication and date."""
-        for forecast in self.medication_forecasts:
-            if forecast.medication == medication and forecast.forecast_date == forecast_date:
-                return forecast
-        return None
+        if self._by_key is None:
+            by_key = {}
+            for forecast in self.medication_forecasts:
+                # First entry wins, matching a front-to-back scan
+                by_key.setdefault((forecast.medication, forecast.forecast_date), forecast)
+            self._by_key = by_key
+        return self._by_key.get((medication, forecast_date))
 
     def get_high_risk_medications(self) -> List[MedicationForecast]:
         """Get medications with shortage or spike alerts."""
-        return [
-            f for f in self.medication_forecasts
-            if DemandAlert.SHORTAGE_RISK in f.alerts or DemandAlert.SPIKE in f.alerts
-        ]
+        if self._risk_mask is None:
+            self._risk_mask = np.fromiter(
+                (not f.alerts.isdisjoint(_HIGH_RISK_ALERTS) for f in self.medication_forecasts),
+                dtype=bool,
+                count=len(self.medication_forecasts),
+            )
+        forecasts = self.medication_forecasts
+        return [forecasts[i] for i in np.flatnonzero(self._risk_mask)]
 
     def get_category_summary(self, category: str) -> Optional[CategoryForecast]:
         """Get summary for specific category."""
-        for cat_forecast in self.category_forecasts:
-            if cat_forecast.category == category:
-                return cat_forecast
-        return None
+        if self._cat_index is None:
+            cat_index = {}
+            for cat_forecast in self.category_forecasts:
+                cat_index.setdefault(cat_forecast.category, cat_forecast)
+            self._cat_index = cat_index
+        return self._cat_index.get(category)
+
+    def to_json_bytes(self) -> bytes:
+        """Serialize to JSON with orjson, faster than model_dump_json() for large results."""
+        return orjson.dumps(self.model_dump(), option=orjson.OPT_SERIALIZE_NUMPY, default=str)
 
 
 class ForecastingConfig(BaseModel):
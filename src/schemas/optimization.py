@@ -4,18 +4,34 @@ Optimization Schemas
 Data structures for inventory optimization and order recommendations.
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+import sys
+import numpy as np
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_serializer, field_validator
+from typing import List, Dict, FrozenSet, Optional
 from datetime import date
-from enum import Enum
-
+from enum import Enum, IntEnum
+from functools import cached_property
+
+
+class OrderPriority(IntEnum):
+    """Priority level for orders (lower value = more urgent)."""
+    CRITICAL = 0  # Urgent - risk of stockout
+    HIGH = 1  # Should order soon
+    MEDIUM = 2  # Normal reorder
+    LOW = 3  # Can wait
+
+    @classmethod
+    def _missing_(cls, value):
+        # Accept the old string values ("critical", "high", ...)
+        if isinstance(value, str):
+            return cls.__members__.get(value.upper())
+        return None
 
-class OrderPriority(str, Enum):
-    """Priority level for orders."""
-    CRITICAL = "critical"  # Urgent - risk of stockout
-    HIGH = "high"  # Should order soon
-    MEDIUM = "medium"  # Normal reorder
-    LOW = "low"  # Can wait
+    @property
+    def label(self) -> str:
+        """Lowercase name, as used in serialized output."""
+        return self.name.lower()
 
 
 class OrderReason(str, Enum):
@@ -51,12 +67,20 @@ class MedicationInventory(BaseModel):
     # Lead time
     lead_time_days: int = Field(7, description="Days from order to delivery")
 
+    @field_validator('medication', 'category')
+    @classmethod
+    def _intern_names(cls, v: Optional[str]) -> Optional[str]:
+        # Names repeat across every record; interning shares one string object
+        return sys.intern(str(v)) if v is not None else None
+
 
 class OrderRecommendation(BaseModel):
     """
     Order recommendation for a single medication.
     """
 
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     medication: str = Field(..., description="Medication name")
     category: Optional[str] = Field(None, description="Medication category")
 
@@ -76,7 +100,7 @@ class OrderRecommendation(BaseModel):
 
     # Priority and reasoning
     priority: OrderPriority = Field(..., description="Order priority level")
-    reasons: List[OrderReason] = Field(..., description="Why this order is recommended")
+    reasons: FrozenSet[OrderReason] = Field(..., description="Why this order is recommended")
     urgency_score: float = Field(..., ge=0, le=1, description="Urgency score (0-1)")
 
     # Risk assessment
@@ -86,6 +110,20 @@ class OrderRecommendation(BaseModel):
     # Metadata
     notes: List[str] = Field(default_factory=list, description="Additional notes")
 
+    @field_validator('medication', 'category')
+    @classmethod
+    def _intern_names(cls, v: Optional[str]) -> Optional[str]:
+        # Names repeat across every record; interning shares one string object
+        return sys.intern(str(v)) if v is not None else None
+
+    @field_serializer('priority')
+    def _serialize_priority(self, priority: OrderPriority) -> str:
+        return priority.label
+
+    @field_serializer('reasons')
+    def _serialize_reasons(self, reasons: FrozenSet[OrderReason]) -> List[str]:
+        return sorted(reason.value for reason in reasons)
+
 
 class OptimizationSummary(BaseModel):
     """
@@ -140,30 +178,72 @@ class OptimizationResult(BaseModel):
     # Metadata
     notes: List[str] = Field(default_factory=list, description="Optimization notes")
 
+    # Lookup buckets, built in one pass on first use. Call invalidate_indexes()
+    # after mutating order_recommendations in place.
+    _by_priority: Optional[Dict[OrderPriority, List[OrderRecommendation]]] = PrivateAttr(default=None)
+    _critical: Optional[List[OrderRecommendation]] = PrivateAttr(default=None)
+    _by_med: Optional[Dict[str, OrderRecommendation]] = PrivateAttr(default=None)
+    _cost_arr: Optional[np.ndarray] = PrivateAttr(default=None)
+
+    def _build_indexes(self) -> None:
+        """Bucket orders by priority and medication, keeping list order."""
+        by_priority = {priority: [] for priority in OrderPriority}
+        critical = []
+        by_med = {}
+        for order in self.order_recommendations:
+            by_priority[order.priority].append(order)
+            if order.priority <= OrderPriority.HIGH:
+                critical.append(order)
+            by_med.setdefault(order.medication, order)
+        self._by_priority = by_priority
+        self._critical = critical
+        self._by_med = by_med
+        self._cost_arr = np.fromiter(
+            (order.order_cost for order in self.order_recommendations),
+            dtype=np.float64,
+            count=len(self.order_recommendations),
+        )
+
+    def invalidate_indexes(self) -> None:
+        """Drop cached buckets so they are rebuilt from order_recommendations."""
+        self._by_priority = None
+        self._critical = None
+        self._by_med = None
+        self._cost_arr = None
+        self.__dict__.pop('total_order_cost', None)
+
     def get_critical_orders(self) -> List[OrderRecommendation]:
         """Get critical and high priority orders."""
-        return [
-            order for order in self.order_recommendations
-            if order.priority in [OrderPriority.CRITICAL, OrderPriority.HIGH]
-        ]
+        if self._critical is None:
+            self._build_indexes()
+        return list(self._critical)
 
     def get_order_by_medication(self, medication: str) -> Optional[OrderRecommendation]:
         """Get order recommendation for specific medication."""
-        for order in self.order_recommendations:
-            if order.medication == medication:
-                return order
-        return None
+        if self._by_med is None:
+            self._build_indexes()
+        return self._by_med.get(medication)
+
+    @cached_property
+    def total_order_cost(self) -> float:
+        """Total cost of all recommended orders, computed once."""
+        if self._cost_arr is None:
+            self._build_indexes()
+        return float(self._cost_arr.sum())
 
     def get_total_order_cost(self) -> float:
         """Calculate total cost of all recommended orders."""
-        return sum(order.order_cost for order in self.order_recommendations)
+        return self.total_order_cost
 
     def get_orders_by_priority(self, priority: OrderPriority) -> List[OrderRecommendation]:
         """Get all orders of a specific priority."""
-        return [
-            order for order in self.order_recommendations
-            if order.priority == priority
-        ]
+        if self._by_priority is None:
+            self._build_indexes()
+        return list(self._by_priority.get(OrderPriority(priority), ()))
+
+    def to_json_bytes(self) -> bytes:
+        """Serialize to JSON with orjson, faster than model_dump_json() for large results."""
+        return orjson.dumps(self.model_dump(), option=orjson.OPT_SERIALIZE_NUMPY, default=str)
 
 
 class OptimizationConfig(BaseModel):
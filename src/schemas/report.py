@@ -4,10 +4,12 @@ Report Data Schemas
 Defines data structures for downloaded reports and extracted data.
 """
 
-from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional, List
+from pydantic import BaseModel, Field, HttpUrl, TypeAdapter
+from typing import Annotated, Optional, List
+from dataclasses import dataclass, field
 from datetime import date, datetime
 from enum import Enum
+from functools import cache
 
 
 class ReportStatus(str, Enum):
@@ -19,91 +21,86 @@ class ReportStatus(str, Enum):
     FAILED = "failed"
 
 
-class DownloadedReport(BaseModel):
+@cache
+def _adapter(cls: type) -> TypeAdapter:
+    """Validation adapter for a report dataclass, built once per type."""
+    return TypeAdapter(cls)
+
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class DownloadedReport:
     """Metadata for a downloaded report."""
-    
-    url: str = Field(..., description="URL where report was downloaded from")
-    filename: str = Field(..., description="Local filename of downloaded PDF")
-    download_date: datetime = Field(..., description="When the report was downloaded")
-    file_size_bytes: int = Field(..., description="Size of downloaded file")
-    report_date: Optional[date] = Field(None, description="Date the report covers")
-    status: ReportStatus = Field(ReportStatus.DOWNLOADED, description="Processing status")
+
+    url: str  # URL where report was downloaded from
+    filename: str  # Local filename of downloaded PDF
+    download_date: datetime  # When the report was downloaded
+    file_size_bytes: int  # Size of downloaded file
+    report_date: Optional[date] = None  # Date the report covers
+    status: ReportStatus = ReportStatus.DOWNLOADED  # Processing status
+
+    @classmethod
+    def from_untrusted(cls, data: dict) -> "DownloadedReport":
+        """Validate external data (e.g. JSON from disk) into a DownloadedReport."""
+        return _adapter(cls).validate_python(data)
 
 
-class ParsedReportContent(BaseModel):
+@dataclass(slots=True, frozen=True, kw_only=True)
+class ParsedReportContent:
     """Extracted text content from a report."""
-    
-    filename: str = Field(..., description="Source filename")
-    full_text: str = Field(..., description="Complete extracted text")
-    summary_section: Optional[str] = Field(None, description="First page summary")
-    page_count: int = Field(..., description="Number of pages in PDF")
-    extraction_method: str = Field(..., description="Method used (PyPDF2, pdfplumber)")
-    char_count: int = Field(..., description="Total characters extracted")
-    extraction_date: datetime = Field(..., description="When text was extracted")
-    extraction_successful: bool = Field(..., description="Whether extraction succeeded")
 
+    filename: str  # Source filename
+    full_text: str  # Complete extracted text
+    summary_section: Optional[str] = None  # First page summary
+    page_count: int  # Number of pages in PDF
+    extraction_method: str  # Method used (PyPDF2, pdfplumber)
+    char_count: int  # Total characters extracted
+    extraction_date: datetime  # When text was extracted
+    extraction_successful: bool  # Whether extraction succeeded
+
+    @classmethod
+    def from_untrusted(cls, data: dict) -> "ParsedReportContent":
+        """Validate external data (e.g. JSON from disk) into a ParsedReportContent."""
+        return _adapter(cls).validate_python(data)
 
-class FluDataExtraction(BaseModel):
+
+@dataclass(slots=True, frozen=True, kw_only=True)
+class FluDataExtraction:
     """
     Structured flu data extracted by Gemini from report text.
     
-    This is what the Report Analyst Agent produces.
+    This is what the Report Analyst Agent produces. Build it from LLM output
+    with from_untrusted(), which enforces the range constraints below.
     """
     
-    flu_level: int = Field(
-        ..., 
-        ge=1, 
-        le=10, 
-        description="Estimated flu activity level (1=minimal, 10=very high)"
-    )
-    trend: str = Field(
-        ..., 
-        description="Trend: increasing, stable, decreasing, rapid_increase, rapid_decrease"
-    )
-    ili_rate_per_100k: Optional[float] = Field(
-        None, 
-        description="ILI consultation rate per 100,000 population"
-    )
-    confirmed_cases: Optional[int] = Field(
-        None, 
-        description="Number of laboratory-confirmed influenza cases"
-    )
-    dominant_strain: Optional[str] = Field(
-        None, 
-        description="Dominant influenza strain (e.g., A(H3N2), B/Victoria)"
-    )
-    positivity_rate: Optional[float] = Field(
-        None, 
-        ge=0, 
-        le=100, 
-        description="Percentage of samples testing positive for influenza"
-    )
-    alerts: List[str] = Field(
-        default_factory=list, 
-        description="Any warnings or alerts mentioned"
-    )
-    regional_data: Optional[dict] = Field(
-        None, 
-        description="Regional breakdown if available"
-    )
-    confidence: float = Field(
-        ..., 
-        ge=0, 
-        le=1, 
-        description="Confidence in extraction accuracy (0-1)"
-    )
-    summary: str = Field(
-        ..., 
-        description="Brief English summary of the report"
-    )
-    week_number: Optional[int] = Field(
-        None, 
-        description="Epidemiological week number"
-    )
-    report_period: Optional[str] = Field(
-        None, 
-        description="Time period covered by report"
-    )
+    # Estimated flu activity level (1=minimal, 10=very high)
+    flu_level: Annotated[int, Field(ge=1, le=10)]
+    # Trend: increasing, stable, decreasing, rapid_increase, rapid_decrease
+    trend: str
+    # ILI consultation rate per 100,000 population
+    ili_rate_per_100k: Optional[float] = None
+    # Number of laboratory-confirmed influenza cases
+    confirmed_cases: Optional[int] = None
+    # Dominant influenza strain (e.g., A(H3N2), B/Victoria)
+    dominant_strain: Optional[str] = None
+    # Percentage of samples testing positive for influenza
+    positivity_rate: Annotated[Optional[float], Field(ge=0, le=100)] = None
+    # Any warnings or alerts mentioned
+    alerts: List[str] = field(default_factory=list)
+    # Regional breakdown if available
+    regional_data: Optional[dict] = None
+    # Confidence in extraction accuracy (0-1)
+    confidence: Annotated[float, Field(ge=0, le=1)]
+    # Brief English summary of the report
+    summary: str
+    # Epidemiological week number
+    week_number: Optional[int] = None
+    # Time period covered by report
+    report_period: Optional[str] = None
+
+    @classmethod
+    def from_untrusted(cls, data: dict) -> "FluDataExtraction":
+        """Validate LLM or disk data into a FluDataExtraction; unknown keys are ignored."""
+        return _adapter(cls).validate_python(data)
 
 
 class ReportAnalysisResult(BaseModel):
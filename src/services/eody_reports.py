@@ -4,14 +4,33 @@ EODY Reports Service
 Loads processed EODY report data (manually uploaded and analyzed).
 """
 
-import json
+import hashlib
+import os
+import pickle
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, date
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Parsed reports persisted across process restarts
+_DISK_CACHE_NAME = ".reports_cache.pkl"
+
+# Upper bound on threads reading individual report files
+_MAX_LOAD_WORKERS = 8
+
+
+def _load_report_file(path: str) -> Optional[Dict]:
+    """Parse one processed report file, logging instead of raising on failure."""
+    try:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except Exception as e:
+        logger.error(f"Failed to load {path}: {e}")
+        return None
+
 
 class EODYReportsService:
     """
@@ -33,7 +52,7 @@ class EODYReportsService:
         """
         self.processed_dir = Path(processed_dir)
         self._cached_reports: Optional[List[Dict]] = None
-        self._cache_timestamp: Optional[datetime] = None
+        self._cache_signature: Optional[Tuple[int, str]] = None
     
     def get_latest_report(self) -> Optional[Dict]:
         """
@@ -48,14 +67,8 @@ class EODYReportsService:
             logger.warning("No processed EODY reports found")
             return None
         
-        # Sort by processed date, most recent first
-        sorted_reports = sorted(
-            reports,
-            key=lambda r: r.get('processed_date', ''),
-            reverse=True
-        )
-        
-        latest = sorted_reports[0]
+        # Most recently processed report (first one wins on ties)
+        latest = max(reports, key=lambda r: r.get('processed_date', ''))
         logger.info(f"Using latest report: {latest['filename']}")
         
         return latest['flu_data']
@@ -76,42 +89,105 @@ class EODYReportsService:
         Returns:
             List of report dictionaries
         """
-        # Check cache (valid for 1 hour)
-        if self._cached_reports and self._cache_timestamp:
-            age = datetime.now() - self._cache_timestamp
-            if age.total_seconds() < 3600:
-                return self._cached_reports
+        # Check cache (valid until a report file is added, removed or rewritten)
+        signature = self.source_signature()
+        if self._cached_reports is not None and signature == self._cache_signature:
+            return self._cached_reports
         
+        # Reuse the parsed reports from a previous process if no JSON changed
+        reports = self._read_disk_cache(signature)
+        if reports is not None:
+            self._cached_reports = reports
+            self._cache_signature = signature
+            return reports
+
         reports = []
-        
+
         # Check for combined summary file first
         summary_file = self.processed_dir / "all_reports_summary.json"
         if summary_file.exists():
             try:
-                with open(summary_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    reports = data.get('reports', [])
-                    logger.info(f"Loaded {len(reports)} reports from summary file")
+                data = orjson.loads(summary_file.read_bytes())
+                reports = data.get('reports', [])
+                logger.info(f"Loaded {len(reports)} reports from summary file")
             except Exception as e:
                 logger.error(f"Failed to load summary file: {e}")
         
         # If no summary, load individual files
         if not reports and self.processed_dir.exists():
-            for json_file in self.processed_dir.glob("*_analysis.json"):
-                try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        report = json.load(f)
-                        reports.append(report)
-                except Exception as e:
-                    logger.error(f"Failed to load {json_file}: {e}")
+            with os.scandir(self.processed_dir) as entries:
+                paths = [
+                    entry.path for entry in entries
+                    if entry.name.endswith("_analysis.json") and entry.is_file()
+                ]
+
+            if len(paths) > 1:
+                with ThreadPoolExecutor(max_workers=min(_MAX_LOAD_WORKERS, len(paths))) as executor:
+                    loaded = list(executor.map(_load_report_file, paths))
+            else:
+                loaded = [_load_report_file(path) for path in paths]
+            reports = [report for report in loaded if report is not None]
             
             logger.info(f"Loaded {len(reports)} individual report files")
         
         # Update cache
         self._cached_reports = reports
-        self._cache_timestamp = datetime.now()
+        self._cache_signature = signature
+        self._write_disk_cache(signature, reports)
         
         return reports
+
+    def source_signature(self) -> Optional[Tuple[int, str]]:
+        """
+        Fingerprint the processed JSON files as (file count, digest).
+
+        The digest covers each file's name, size and mtime, so replacing,
+        renaming or removing a file changes it even when the count and the
+        newest mtime stay the same.
+
+        Returns:
+            Signature tuple, or None if the directory does not exist
+        """
+        try:
+            entries = os.scandir(self.processed_dir)
+        except OSError:
+            return None
+
+        files = []
+        with entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.is_file():
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        files.sort()
+        digest = hashlib.blake2b(repr(files).encode(), digest_size=16).hexdigest()
+        return len(files), digest
+
+    def _read_disk_cache(self, signature: Optional[Tuple[int, str]]) -> Optional[List[Dict]]:
+        """Load reports pickled by an earlier run if they match the signature."""
+        if not signature or not signature[0]:
+            return None
+        try:
+            cached_signature, reports = pickle.loads(
+                (self.processed_dir / _DISK_CACHE_NAME).read_bytes()
+            )
+        except Exception:
+            return None
+        if tuple(cached_signature) != signature:
+            return None
+        logger.info(f"Loaded {len(reports)} reports from disk cache")
+        return reports
+
+    def _write_disk_cache(self, signature: Optional[Tuple[int, str]], reports: List[Dict]) -> None:
+        """Persist parsed reports next to their sources; failures are non-fatal."""
+        if not signature or not reports:
+            return
+        try:
+            (self.processed_dir / _DISK_CACHE_NAME).write_bytes(
+                pickle.dumps((signature, reports), protocol=5)
+            )
+        except OSError as e:
+            logger.debug(f"Could not write reports disk cache: {e}")
     
     def has_reports(self) -> bool:
         """
@@ -7,15 +7,184 @@ API Documentation: https://openweathermap.org/api
 Falls back to simulation if API key not available.
 """
 
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import os
-from datetime import date, datetime, timedelta
-from typing import Optional, Dict
+import tempfile
+import threading
+import time
+import orjson
+import numpy as np
+import pandas as pd
+from datetime import date
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Shared keep-alive session: reuses TCP/TLS connections across clients and
+# retries transient failures (including free-tier rate limiting) with backoff.
+# Only idempotent GETs are retried, with a single connect retry so an
+# unreachable host falls back to simulation quickly.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=2,
+        connect=1,
+        read=2,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods={"GET"},
+    ),
+))
+
+# (connect, read) timeouts in seconds
+_REQUEST_TIMEOUT = (1.5, 5)
+
+
+# Bounds for the simulated-weather draws: temperature variation, min/max
+# spread, humidity variation, and a unit draw scaled into the precipitation range
+_SIM_LOW = np.array([-8.0, 10.0, -10.0, 0.0])
+_SIM_HIGH = np.array([8.0, 20.0, 10.0, 1.0])
+
+# Last reading per location with its (ETag, Last-Modified) validators, used to
+# send conditional requests when the hour bucket rolls over
+_LAST_RESPONSE: Dict[str, Tuple[Optional[str], Optional[str], Dict]] = {}
+
+# Persisted cold-snap state older than this is ignored on startup
+_STATE_MAX_AGE = 24 * 3600
+
+
+def _safe_location(location: str) -> str:
+    return location.replace("/", "_").replace(" ", "_")
+
+
+def _cache_path(cache_dir: Path, location: str, hour_bucket: int) -> Path:
+    """Disk cache file for a location and hour bucket."""
+    return cache_dir / f"{_safe_location(location)}_{hour_bucket}.json"
+
+
+def _state_path(cache_dir: Path, location: str) -> Path:
+    """
+    Cold-snap state file for a location. Its ".last_temp" suffix is never
+    "_<digits>", so the hourly cache pruning in _write_disk_cache skips it.
+    """
+    return cache_dir / f"{_safe_location(location)}.last_temp.json"
+
+
+def _write_json_atomic(path: Path, obj: Dict) -> bool:
+    """Write JSON via temp file + rename so readers never see a partial file."""
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(obj))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug("Could not write weather cache: %s", e)
+        return False
+    return True
+
+
+def _read_disk_cache(path: Path) -> Optional[Dict]:
+    """Load a reading fetched earlier this hour, possibly by another process."""
+    try:
+        return orjson.loads(path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def _write_disk_cache(path: Path, reading: Dict) -> None:
+    """
+    Write a reading to the disk cache atomically and drop files for
+    earlier hours of the same location.
+    """
+    if not _write_json_atomic(path, reading):
+        return
+    
+    # Match "<prefix>_<digits>.json" exactly: a glob would also catch other
+    # locations sharing the prefix ("New" vs "New_York") and would treat
+    # glob metacharacters in the location name as wildcards
+    prefix = path.name.rsplit("_", 1)[0] + "_"
+    with os.scandir(path.parent) as entries:
+        for entry in entries:
+            name = entry.name
+            if (name != path.name and name.startswith(prefix) and name.endswith(".json")
+                    and name[len(prefix):-5].isdigit()):
+                Path(entry.path).unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=32)
+def _fetch_current_reading(
+    location: str,
+    api_key: str,
+    hour_bucket: int,
+    cache_dir: Optional[Path] = None
+) -> Dict:
+    """
+    Current conditions for a location, cached per wall-clock hour.
+    
+    hour_bucket is int(time.time() // 3600); a new hour means a new key, so
+    entries expire by the clock and never by access. Errors propagate and
+    are not cached, so the next call retries.
+    """
+    path = _cache_path(cache_dir, location, hour_bucket) if cache_dir else None
+    if path:
+        reading = _read_disk_cache(path)
+        if reading:
+            logger.debug("Using disk-cached weather data")
+            return reading
+    
+    headers = {}
+    previous = _LAST_RESPONSE.get(location)
+    if previous:
+        etag, last_modified, _ = previous
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    
+    response = _SESSION.get(
+        f"{WeatherAPI.BASE_URL}/weather",
+        params={
+            "q": location,
+            "appid": api_key,
+            "units": "imperial"  # Fahrenheit
+        },
+        headers=headers,
+        timeout=_REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    
+    if response.status_code == 304 and previous:
+        reading = previous[2]
+        logger.debug("Weather unchanged since last fetch (304)")
+    else:
+        data = response.json()
+        reading = {
+            "temperature_avg_f": data["main"]["temp"],
+            "temperature_min_f": data["main"]["temp_min"],
+            "temperature_max_f": data["main"]["temp_max"],
+            "humidity_percent": data["main"]["humidity"],
+            "conditions": data["weather"][0]["description"],
+        }
+        logger.info("Fetched real weather: %.1f°F", reading["temperature_avg_f"])
+    
+    _LAST_RESPONSE[location] = (
+        response.headers.get("ETag"),
+        response.headers.get("Last-Modified"),
+        reading,
+    )
+    if path:
+        _write_disk_cache(path, reading)
+    
+    return reading
+
 
 class WeatherAPI:
     """
@@ -27,6 +196,9 @@ class WeatherAPI:
     
     BASE_URL = "https://api.openweathermap.org/data/2.5"
     
+    # Seconds the first request waits for the background warm-up fetch
+    WARM_START_WAIT = 2.0
+    
     # Simulated weather by month (Northern Hemisphere, temperate climate)
     SEASONAL_WEATHER = {
         1: {"temp": 35, "humidity": 70, "conditions": "Cold"},
@@ -43,6 +215,15 @@ class WeatherAPI:
         12: {"temp": 38, "humidity": 70, "conditions": "Cold"},
     }
     
+    # SEASONAL_WEATHER as (temp, humidity, conditions) tuples indexed by month
+    # (slot 0 unused), plus per-field arrays for the vectorized batch path
+    _SEASONAL_BY_MONTH = ((0.0, 0.0, ""),) + tuple(
+        (v["temp"], v["humidity"], v["conditions"]) for _, v in sorted(SEASONAL_WEATHER.items())
+    )
+    _SEASONAL_TEMP = np.array([t for t, _, _ in _SEASONAL_BY_MONTH], dtype=float)
+    _SEASONAL_HUMIDITY = np.array([h for _, h, _ in _SEASONAL_BY_MONTH], dtype=float)
+    _SEASONAL_CONDITIONS = np.array([c for _, _, c in _SEASONAL_BY_MONTH], dtype=object)
+    
     def __init__(
         self, 
         api_key: str = None, 
@@ -60,14 +241,64 @@ class WeatherAPI:
         self.api_key = api_key or os.environ.get("OPENWEATHER_API_KEY")
         self.location = location
         self.cache_dir = Path(cache_dir) if cache_dir else None
-        self._last_fetch: Optional[datetime] = None
-        self._cached_data: Optional[Dict] = None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
         self._previous_temp: Optional[float] = None
+        self._last_reading: Optional[Dict] = None
+        self._is_cold_snap = False
+        # Hour bucket of the reading the cold-snap state was last advanced for
+        self._state_hour: Optional[int] = None
+        self._load_state()
+        self._rng = np.random.default_rng()
+        # Guards cold-snap state and the RNG; one client may be shared by
+        # several Streamlit sessions (see get_weather_client)
+        self._lock = threading.RLock()
+        self._warm_done = threading.Event()
         
         if not self.api_key:
             logger.info("No OpenWeather API key found - will use simulated data")
+            self._warm_done.set()
         else:
-            logger.info(f"OpenWeather API initialized for {location}")
+            logger.info("OpenWeather API initialized for %s", location)
+            threading.Thread(target=self._warm_start, daemon=True).start()
+    
+    def _load_state(self) -> None:
+        """
+        Restore the last real temperature saved by an earlier process, so
+        cold-snap detection works on the first fetch after a restart.
+        """
+        if not self.cache_dir:
+            return
+        path = _state_path(self.cache_dir, self.location)
+        try:
+            if time.time() - path.stat().st_mtime > _STATE_MAX_AGE:
+                return
+            state = orjson.loads(path.read_bytes())
+            self._previous_temp = float(state["temperature_avg_f"])
+            self._is_cold_snap = bool(state["is_cold_snap"])
+            self._state_hour = int(state["hour_bucket"])
+        except (OSError, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+            return
+    
+    def _save_state(self) -> None:
+        """Persist the current cold-snap state; call with _lock held."""
+        if not self.cache_dir:
+            return
+        _write_json_atomic(_state_path(self.cache_dir, self.location), {
+            "temperature_avg_f": self._previous_temp,
+            "is_cold_snap": self._is_cold_snap,
+            "hour_bucket": self._state_hour,
+            "timestamp": time.time(),
+        })
+    
+    def _warm_start(self) -> None:
+        """Prefetch the current reading into the shared cache in the background."""
+        try:
+            _fetch_current_reading(self.location, self.api_key, int(time.time() // 3600), self.cache_dir)
+        except Exception as e:
+            logger.debug("Weather warm-up fetch failed: %s", e)
+        finally:
+            self._warm_done.set()
     
     def get_current_weather(self, target_date: date = None) -> Dict:
         """
@@ -84,97 +315,118 @@ class WeatherAPI:
         
         # Try real API if key available
         if self.api_key:
+            # Let an in-flight warm-up finish rather than issuing a duplicate request
+            self._warm_done.wait(self.WARM_START_WAIT)
             try:
                 data = self._fetch_real_data(target_date)
                 if data:
                     return data
             except Exception as e:
-                logger.warning(f"Could not fetch real weather data: {e}")
+                logger.warning("Could not fetch real weather data: %s", e)
         
         # Fall back to simulation
         logger.info("Using simulated weather data")
         return self._generate_simulated_data(target_date)
     
+    async def get_current_weather_many(
+        self,
+        locations: List[str],
+        target_date: date = None
+    ) -> Dict[str, Dict]:
+        """
+        Get current weather for several locations concurrently.
+        
+        Each location is served by its shared client (see get_weather_client),
+        so per-location caches and cold-snap state stay separate; the fetches
+        overlap on worker threads over the pooled session.
+        
+        Args:
+            locations: Locations in the same format as ``location``
+            target_date: Date to get weather for (default: today)
+            
+        Returns:
+            Dict mapping each location to its weather data
+        """
+        cache_dir = str(self.cache_dir) if self.cache_dir else None
+        clients = [
+            self if location == self.location else get_weather_client(location, cache_dir, self.api_key)
+            for location in locations
+        ]
+        results = await asyncio.gather(*(
+            asyncio.to_thread(client.get_current_weather, target_date)
+            for client in clients
+        ))
+        return dict(zip(locations, results))
+    
     def _fetch_real_data(self, target_date: date) -> Optional[Dict]:
         """
         Fetch real weather data from OpenWeather API.
         """
-        # Check cache
-        if self._cached_data and self._last_fetch:
-            cache_age = datetime.now() - self._last_fetch
-            if cache_age < timedelta(hours=1):
-                logger.debug("Using cached weather data")
-                return self._cached_data
-        
+        hour_bucket = int(time.time() // 3600)
         try:
-            # Current weather endpoint
-            url = f"{self.BASE_URL}/weather"
-            params = {
-                "q": self.location,
-                "appid": self.api_key,
-                "units": "imperial"  # Fahrenheit
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Parse response
-            weather_data = {
-                "temperature_avg_f": data["main"]["temp"],
-                "temperature_min_f": data["main"]["temp_min"],
-                "temperature_max_f": data["main"]["temp_max"],
-                "humidity_percent": data["main"]["humidity"],
-                "precipitation_probability": 0.0,  # Not in current weather
-                "conditions": data["weather"][0]["description"],
-                "is_cold_snap": self._detect_cold_snap(data["main"]["temp"]),
-                "forecast_date": target_date.isoformat(),
-                "data_source": "openweather"
-            }
-            
-            # Update cache
-            self._cached_data = weather_data
-            self._last_fetch = datetime.now()
-            self._previous_temp = data["main"]["temp"]
-            
-            logger.info(f"Fetched real weather: {weather_data['temperature_avg_f']:.1f}°F")
-            return weather_data
-            
+            reading = _fetch_current_reading(self.location, self.api_key, hour_bucket, self.cache_dir)
         except Exception as e:
-            logger.error(f"OpenWeather API error: {e}")
+            logger.error("OpenWeather API error: %s", e)
             return None
+        
+        # Cold-snap state advances once per new reading, not on cache hits.
+        # A reading from the hour the saved state was taken in (e.g. served
+        # from the disk cache after a restart) keeps the saved flag.
+        with self._lock:
+            if reading is not self._last_reading:
+                if hour_bucket != self._state_hour:
+                    self._is_cold_snap = self._detect_cold_snap(reading["temperature_avg_f"])
+                self._previous_temp = reading["temperature_avg_f"]
+                self._last_reading = reading
+                self._state_hour = hour_bucket
+                self._save_state()
+            is_cold_snap = self._is_cold_snap
+        
+        return {
+            "temperature_avg_f": reading["temperature_avg_f"],
+            "temperature_min_f": reading["temperature_min_f"],
+            "temperature_max_f": reading["temperature_max_f"],
+            "humidity_percent": reading["humidity_percent"],
+            "precipitation_probability": 0.0,  # Not in current weather
+            "conditions": reading["conditions"],
+            "is_cold_snap": is_cold_snap,
+            "forecast_date": target_date.isoformat(),
+            "data_source": "openweather"
+        }
     
     def _generate_simulated_data(self, target_date: date) -> Dict:
         """
         Generate realistic simulated weather data.
         """
-        import random
+        base_temp, base_humidity, base_conditions = self._SEASONAL_BY_MONTH[target_date.month]
         
-        month = target_date.month
-        base = self.SEASONAL_WEATHER[month]
+        # All random variation in one draw
+        with self._lock:
+            temp_variation, temp_range, humidity_noise, precip_draw = (
+                self._rng.uniform(_SIM_LOW, _SIM_HIGH).tolist()
+            )
         
         # Add daily variation
-        temp_variation = random.uniform(-8, 8)
-        avg_temp = base["temp"] + temp_variation
+        avg_temp = base_temp + temp_variation
         
         # Min/max temperatures
-        temp_range = random.uniform(10, 20)
         min_temp = avg_temp - temp_range / 2
         max_temp = avg_temp + temp_range / 2
         
         # Humidity variation
-        humidity = base["humidity"] + random.uniform(-10, 10)
+        humidity = base_humidity + humidity_noise
         humidity = max(20, min(95, humidity))
         
         # Precipitation probability
-        precip_prob = random.uniform(0, 0.4) if humidity > 60 else random.uniform(0, 0.2)
+        precip_prob = precip_draw * (0.4 if humidity > 60 else 0.2)
         
         # Detect cold snap
-        is_cold_snap = False
-        if self._previous_temp is not None:
-            temp_drop = self._previous_temp - avg_temp
-            is_cold_snap = temp_drop > 15  # 15°F drop
-        self._previous_temp = avg_temp
+        with self._lock:
+            is_cold_snap = False
+            if self._previous_temp is not None:
+                temp_drop = self._previous_temp - avg_temp
+                is_cold_snap = temp_drop > 15  # 15°F drop
+            self._previous_temp = avg_temp
         
         # Conditions
         if precip_prob > 0.6:
@@ -187,7 +439,7 @@ class WeatherAPI:
         elif avg_temp > 85:
             conditions = "Hot and humid"
         else:
-            conditions = base["conditions"]
+            conditions = base_conditions
         
         return {
             "temperature_avg_f": round(avg_temp, 1),
@@ -201,10 +453,73 @@ class WeatherAPI:
             "data_source": "simulated"
         }
     
+    def generate_simulated_batch(self, dates: List[date]) -> pd.DataFrame:
+        """
+        Simulated weather for many dates at once, one row per date with the
+        same columns as _generate_simulated_data. Draws all random values in
+        a single call; cold snaps are detected day over day in list order.
+        """
+        n = len(dates)
+        months = np.fromiter((d.month for d in dates), dtype=np.int64, count=n)
+        base_temp = self._SEASONAL_TEMP[months]
+        base_humidity = self._SEASONAL_HUMIDITY[months]
+        base_conditions = self._SEASONAL_CONDITIONS[months]
+        
+        with self._lock:
+            draws = self._rng.uniform(_SIM_LOW, _SIM_HIGH, size=(n, 4))
+        avg_temp = base_temp + draws[:, 0]
+        min_temp = avg_temp - draws[:, 1] / 2
+        max_temp = avg_temp + draws[:, 1] / 2
+        humidity = np.clip(base_humidity + draws[:, 2], 20, 95)
+        precip_prob = draws[:, 3] * np.where(humidity > 60, 0.4, 0.2)
+        
+        # Cold snap: 15°F drop from the previous day (or the last simulated temp)
+        previous = np.empty(n)
+        if n:
+            with self._lock:
+                previous[0] = np.nan if self._previous_temp is None else self._previous_temp
+                self._previous_temp = float(avg_temp[-1])
+            previous[1:] = avg_temp[:-1]
+        is_cold_snap = (previous - avg_temp) > 15
+        
+        wet = precip_prob > 0.6
+        conditions = np.select(
+            [wet & (avg_temp < 32), wet, avg_temp < 32, avg_temp > 85],
+            ["Snow likely", "Rain likely", "Cold and clear", "Hot and humid"],
+            default=base_conditions
+        )
+        
+        return pd.DataFrame({
+            "temperature_avg_f": avg_temp.round(1),
+            "temperature_min_f": min_temp.round(1),
+            "temperature_max_f": max_temp.round(1),
+            "humidity_percent": humidity.round(1),
+            "precipitation_probability": precip_prob.round(2),
+            "conditions": conditions,
+            "is_cold_snap": is_cold_snap,
+            "forecast_date": [d.isoformat() for d in dates],
+            "data_source": "simulated",
+        })
+    
     def _detect_cold_snap(self, current_temp: float) -> bool:
         """Detect if there's a sudden temperature drop."""
         if self._previous_temp is None:
             return False
         
         temp_drop = self._previous_temp - current_temp
-        return temp_drop > 15  # 15°F drop is significant
\ No newline at end of file
+        return temp_drop > 15  # 15°F drop is significant
+
+
+@lru_cache(maxsize=None)
+def get_weather_client(
+    location: str = "Athens,GR",
+    cache_dir: Optional[str] = None,
+    api_key: Optional[str] = None
+) -> WeatherAPI:
+    """
+    Process-wide WeatherAPI per (location, cache_dir, api_key).
+    
+    Streamlit sessions share the server process, so every session (and every
+    agent built for it) gets the same client and the same cached readings.
+    """
+    return WeatherAPI(api_key=api_key, location=location, cache_dir=cache_dir)
@@ -1,15 +1,19 @@
 """
 Streamlit Components for Apothecary-AI Dashboard
-"""
 
-from src.streamlit_components.charts import (
-    render_inventory_chart,
-    render_forecast_chart,
-    render_category_breakdown
-)
+Renderers are imported from charts on first access (PEP 562), so importing
+this package does not pull in Streamlit or Plotly.
+"""
 
 __all__ = [
     "render_inventory_chart",
     "render_forecast_chart",
     "render_category_breakdown"
 ]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from src.streamlit_components import charts
+        return getattr(charts, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,59 +4,197 @@ Visualization Components for Streamlit Dashboard
 Renders charts and graphs for inventory, forecasts, and patient data.
 """
 
+import os
+import time
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple
 from pathlib import Path
+from pandas.api.types import union_categoricals
+
+
+INVENTORY_PATH = Path("data/raw/inventory/current_stock.csv")
+MEDICATION_PATH = Path("data/raw/medications/medication_database.csv")
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_inventory_frame(inventory_mtime: int, medication_mtime: int) -> pd.DataFrame:
+    """
+    Read and merge the inventory CSVs. The mtimes are only cache keys:
+    touching either file produces a new key and a fresh read.
+    """
+    inventory = pd.read_csv(INVENTORY_PATH, dtype={'medication': 'category'})
+    medications = pd.read_csv(
+        MEDICATION_PATH,
+        usecols=['medication', 'category'],
+        dtype={'medication': 'category', 'category': 'category'},
+    )
+
+    # Give both key columns the same categories so the merge joins on the
+    # integer codes and the result keeps the categorical dtype
+    shared = union_categoricals(
+        [inventory['medication'], medications['medication']], sort_categories=True
+    ).categories
+    inventory['medication'] = inventory['medication'].cat.set_categories(shared)
+    medications['medication'] = medications['medication'].cat.set_categories(shared)
+
+    # Merge to get categories
+    return inventory.merge(
+        medications,
+        on='medication',
+        how='left'
+    )
+
+
+class InventoryRollup(NamedTuple):
+    """Inventory aggregated per medication and per category."""
+    by_medication: pd.DataFrame  # medication, quantity, unit_cost, category, total_value
+    by_category: pd.DataFrame  # category, quantity, unit_cost, total_value
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _inventory_rollups(inventory_mtime: int, medication_mtime: int) -> InventoryRollup:
+    """
+    Aggregate the inventory once for every chart on the page, cached on the
+    same mtime key as the CSV load. The category rollup is derived from the
+    (much smaller) per-medication frame; unit_cost there is still the mean
+    over all inventory rows of the category.
+    """
+    inventory = _load_inventory_frame(inventory_mtime, medication_mtime)
+
+    # Per-medication totals with bincount over sorted medication codes
+    # (same row order as groupby; rows without a medication are dropped)
+    codes, medications = pd.factorize(inventory['medication'], sort=True)
+    n_meds = len(medications)
+    has_med = codes >= 0
+
+    quantity = inventory['quantity'].to_numpy()
+    quantity_sum = np.bincount(codes[has_med], weights=quantity[has_med], minlength=n_meds)
+    if np.issubdtype(quantity.dtype, np.integer):
+        quantity_sum = quantity_sum.astype(quantity.dtype)
+
+    unit_cost = inventory['unit_cost'].to_numpy(dtype=float)
+    has_cost = has_med & ~np.isnan(unit_cost)
+    unit_cost_sum = np.bincount(codes[has_cost], weights=unit_cost[has_cost], minlength=n_meds)
+    row_count = np.bincount(codes[has_cost], minlength=n_meds)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        unit_cost_mean = unit_cost_sum / row_count
+
+    # First non-null category per medication
+    first_category = (
+        inventory.loc[has_med & inventory['category'].notna().to_numpy(), ['medication', 'category']]
+        .drop_duplicates('medication')
+        .set_index('medication')['category']
+    )
+
+    by_medication = pd.DataFrame({
+        'medication': np.asarray(medications),
+        'quantity': quantity_sum,
+        'unit_cost': unit_cost_mean,
+        'category': first_category.reindex(medications).to_numpy(),
+        'unit_cost_sum': unit_cost_sum,
+        'row_count': row_count,
+    })
+
+    by_category = by_medication.groupby('category').agg(
+        quantity=('quantity', 'sum'),
+        unit_cost_sum=('unit_cost_sum', 'sum'),
+        row_count=('row_count', 'sum'),
+    ).reset_index()
+    by_category['unit_cost'] = by_category['unit_cost_sum'] / by_category['row_count']
+    by_category['total_value'] = by_category['quantity'] * by_category['unit_cost']
+    by_category = by_category[['category', 'quantity', 'unit_cost', 'total_value']]
+
+    by_medication['total_value'] = by_medication['quantity'] * by_medication['unit_cost']
+    by_medication = by_medication[['medication', 'quantity', 'unit_cost', 'category', 'total_value']]
+
+    # Sort by quantity descending
+    by_medication = by_medication.sort_values('quantity', ascending=False)
+
+    return InventoryRollup(by_medication=by_medication, by_category=by_category)
+
+
+def _inventory_mtimes():
+    """(inventory, medication) CSV mtimes used as cache keys."""
+    return os.stat(INVENTORY_PATH).st_mtime_ns, os.stat(MEDICATION_PATH).st_mtime_ns
+
+
+@lru_cache(maxsize=1)
+def _inventory_files_missing(minute_bucket: int) -> bool:
+    """
+    Whether either inventory CSV is absent. minute_bucket is
+    int(time.time() // 60), so the answer is reused for the rest of the
+    minute and "no data yet" reruns skip the stat calls; a file that
+    appears is picked up within a minute.
+    """
+    return not (INVENTORY_PATH.exists() and MEDICATION_PATH.exists())
 
 
 def load_inventory_data():
     """Load current inventory data"""
+    if _inventory_files_missing(int(time.time() // 60)):
+        return None
     try:
-        inventory_path = Path("data/raw/inventory/current_stock.csv")
-        medication_path = Path("data/raw/medications/medication_database.csv")
-
-        if inventory_path.exists() and medication_path.exists():
-            inventory = pd.read_csv(inventory_path)
-            medications = pd.read_csv(medication_path)
+        return _load_inventory_frame(*_inventory_mtimes())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        st.error(f"Error loading inventory data: {e}")
+        return None
 
-            # Merge to get categories
-            inventory = inventory.merge(
-                medications[['medication', 'category']],
-                on='medication',
-                how='left'
-            )
 
-            return inventory
+def load_inventory_rollups():
+    """Load the cached InventoryRollup, or None if the data is unavailable"""
+    if _inventory_files_missing(int(time.time() // 60)):
+        return None
+    try:
+        return _inventory_rollups(*_inventory_mtimes())
+    except FileNotFoundError:
         return None
     except Exception as e:
         st.error(f"Error loading inventory data: {e}")
         return None
 
 
+def clear_inventory_cache():
+    """Drop cached inventory frames and figures so the next view re-reads the CSVs"""
+    _load_inventory_frame.clear()
+    _inventory_rollups.clear()
+    _build_category_pie.clear()
+    _inventory_files_missing.cache_clear()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _build_category_pie(inventory_mtime: int, medication_mtime: int):
+    """Build (and cache) the category distribution pie for the current CSVs."""
+    import plotly.express as px
+
+    category_summary = _inventory_rollups(inventory_mtime, medication_mtime).by_category
+
+    fig = px.pie(
+        category_summary,
+        values='quantity',
+        names='category',
+        title='Inventory Distribution',
+        color_discrete_sequence=px.colors.sequential.Blues_r
+    )
+
+    fig.update_layout(height=400)
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+
 def render_inventory_overview_with_chart():
     """Render inventory overview with table and pie chart side-by-side"""
-    inventory = load_inventory_data()
+    rollups = load_inventory_rollups()
 
-    if inventory is None:
+    if rollups is None:
         st.warning("No inventory data available")
         return
 
-    # Group by medication to get totals
-    medication_summary = inventory.groupby('medication').agg({
-        'quantity': 'sum',
-        'unit_cost': 'mean',
-        'category': 'first'
-    }).reset_index()
-
-    medication_summary['total_value'] = (
-        medication_summary['quantity'] * medication_summary['unit_cost']
-    )
-
-    # Sort by quantity descending
-    medication_summary = medication_summary.sort_values('quantity', ascending=False)
+    medication_summary = rollups.by_medication
 
     # Summary metrics at top
     col1, col2, col3 = st.columns(3)
@@ -80,55 +218,35 @@ def render_inventory_overview_with_chart():
 
     with col_table:
         st.markdown("### 📋 Inventory Table")
-        # Display table with formatting
-        display_df = medication_summary[['medication', 'quantity', 'category']].copy()
-        display_df.columns = ['Medication', 'Quantity', 'Category']
-
+        # Display table; headers and number format are set on the widget
         st.dataframe(
-            display_df.style.format({
-                'Quantity': '{:,.0f}'
-            }),
+            medication_summary[['medication', 'quantity', 'category']],
+            column_config={
+                'medication': 'Medication',
+                'quantity': st.column_config.NumberColumn('Quantity', format='%d'),
+                'category': 'Category'
+            },
             use_container_width=True,
             height=400
         )
 
     with col_chart:
         st.markdown("### 📊 Distribution by Category")
-        # Group by category for pie chart
-        category_summary = medication_summary.groupby('category')['quantity'].sum().reset_index()
-
-        # Create pie chart
-        fig = px.pie(
-            category_summary,
-            values='quantity',
-            names='category',
-            title='Inventory Distribution',
-            color_discrete_sequence=px.colors.sequential.Blues_r
-        )
-
-        fig.update_layout(height=400)
-        fig.update_traces(textposition='inside', textinfo='percent+label')
-
+        fig = _build_category_pie(*_inventory_mtimes())
         st.plotly_chart(fig, use_container_width=True)
 
 
 def render_inventory_chart():
     """Render inventory overview chart (legacy - bar chart version)"""
-    inventory = load_inventory_data()
+    import plotly.express as px
 
-    if inventory is None:
+    rollups = load_inventory_rollups()
+
+    if rollups is None:
         st.warning("No inventory data available")
         return
 
-    # Group by category
-    category_summary = inventory.groupby('category').agg({
-        'quantity': 'sum',
-        'unit_cost': 'mean'
-    }).reset_index()
-
-    category_summary['total_value'] = (
-        category_summary['quantity'] * category_summary['unit_cost']
-    )
+    medication_summary, category_summary = rollups
 
     # Create bar chart
     fig = px.bar(
@@ -157,16 +275,18 @@ def render_inventory_chart():
         st.metric("Total Inventory Value", f"${total_value:,.2f}")
 
     with col2:
-        total_items = inventory['medication'].nunique()
+        total_items = len(medication_summary)
         st.metric("Unique Medications", total_items)
 
     with col3:
-        total_quantity = inventory['quantity'].sum()
+        total_quantity = medication_summary['quantity'].sum()
         st.metric("Total Units", f"{total_quantity:,}")
 
 
 def render_category_breakdown(category_data: Dict[str, Any]):
     """Render category breakdown from query results"""
+    import plotly.express as px
+
     if not category_data or 'medications' not in category_data:
         return
 
@@ -236,6 +356,8 @@ def render_forecast_chart(forecast_data: Dict[str, Any]):
 
 def render_patient_analysis_chart(analysis_data: Dict[str, Any]):
     """Render patient analysis visualization"""
+    import plotly.express as px
+
     if not analysis_data:
         return
 
@@ -321,6 +443,41 @@ def render_optimization_summary(opt_data: Dict[str, Any]):
         )
 
 
+# Gauge bands and stock-out threshold; identical for every medication
+_GAUGE_STEPS = (
+    {'range': [0, 3], 'color': "lightgray"},
+    {'range': [3, 7], 'color': "lightgray"},
+    {'range': [7, 14], 'color': "lightgray"}
+)
+_GAUGE_THRESHOLD = {
+    'line': {'color': "red", 'width': 4},
+    'thickness': 0.75,
+    'value': 3
+}
+
+
+@st.cache_data(show_spinner=False)
+def _build_gauge(medication: str, days_supply: float, color: str):
+    """Build (and cache) the days-of-supply gauge figure."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=days_supply,
+        title={'text': f"{medication} - Days Supply"},
+        delta={'reference': 7, 'suffix': " days"},
+        gauge={
+            'axis': {'range': [None, 30]},
+            'bar': {'color': color},
+            'steps': list(_GAUGE_STEPS),
+            'threshold': _GAUGE_THRESHOLD
+        }
+    ))
+
+    fig.update_layout(height=250)
+    return fig
+
+
 def render_inventory_status_gauge(medication: str, current_stock: int, forecasted_demand: int):
     """Render a gauge showing inventory status"""
     days_supply = (current_stock / forecasted_demand * 30) if forecasted_demand > 0 else 999
@@ -339,29 +496,7 @@ def render_inventory_status_gauge(medication: str, current_stock: int, forecaste
         color = "green"
         status = "GOOD"
 
-    # Create gauge
-    fig = go.Figure(go.Indicator(
-        mode="gauge+number+delta",
-        value=days_supply,
-        title={'text': f"{medication} - Days Supply"},
-        delta={'reference': 7, 'suffix': " days"},
-        gauge={
-            'axis': {'range': [None, 30]},
-            'bar': {'color': color},
-            'steps': [
-                {'range': [0, 3], 'color': "lightgray"},
-                {'range': [3, 7], 'color': "lightgray"},
-                {'range': [7, 14], 'color': "lightgray"}
-            ],
-            'threshold': {
-                'line': {'color': "red", 'width': 4},
-                'thickness': 0.75,
-                'value': 3
-            }
-        }
-    ))
-
-    fig.update_layout(height=250)
+    fig = _build_gauge(medication, days_supply, color)
 
     st.plotly_chart(fig, use_container_width=True)
     st.caption(f"Status: **{status}** | Current Stock: {current_stock:,} units | 30-day Demand: {forecasted_demand:,} units")
@@ -5,7 +5,16 @@ Provides standardized logging setup for all agents.
 """
 
 import logging
-from typing import Optional
+import threading
+from typing import Dict, Optional
+
+_DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Formatters shared by format string; %(name)s is the logger's name
+_formatters: Dict[str, logging.Formatter] = {}
+
+# Serializes the check-then-attach of handlers across threads
+_setup_lock = threading.Lock()
 
 
 def setup_logger(
@@ -30,17 +39,21 @@ def setup_logger(
     """
     logger = logging.getLogger(name)
 
-    # Only add handler if it doesn't already have one
-    if not logger.handlers:
-        handler = logging.StreamHandler()
-
-        # Use custom format or default
-        if format_string is None:
-            format_string = f'%(asctime)s - {name} - %(levelname)s - %(message)s'
-
-        formatter = logging.Formatter(format_string)
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        logger.setLevel(level)
+    with _setup_lock:
+        # Only add handler if it doesn't already have one
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+
+            # Use custom format or default
+            format_string = format_string or _DEFAULT_FORMAT
+            formatter = _formatters.get(format_string)
+            if formatter is None:
+                formatter = _formatters[format_string] = logging.Formatter(format_string)
+            handler.setFormatter(formatter)
+            logger.addHandler(handler)
+            logger.setLevel(level)
+
+            # This handler is the only output; don't also emit via root
+            logger.propagate = False
 
     return logger
@@ -5,11 +5,18 @@ Web-based interface for pharmacy inventory management with AG-UI protocol integr
 """
 
 import streamlit as st
+import os
 import sys
 from pathlib import Path
-import asyncio
 import json
+import orjson
+import traceback
+from contextlib import contextmanager
+from collections import OrderedDict
 from datetime import datetime
+from uuid import uuid4
+from functools import lru_cache
+from typing import List, Optional
 
 # Add project root to path
 PROJECT_ROOT = Path(__file__).parent
@@ -23,14 +30,7 @@ from src.agui_protocol import (
     FinalResponse,
     AgentStatus
 )
-from src.streamlit_components.charts import (
-    render_inventory_chart,
-    render_inventory_overview_with_chart,
-    render_forecast_chart,
-    render_patient_analysis_chart,
-    render_optimization_summary,
-    render_category_breakdown
-)
+# Chart renderers are imported where used, so first paint does not load them
 
 # Page config
 st.set_page_config(
@@ -40,8 +40,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
+# Custom CSS (a plain constant; emitted by main() on every run)
+_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -91,7 +91,7 @@ st.markdown("""
         color: #1a1a1a !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
 
 # Initialize session state
@@ -103,6 +103,9 @@ def init_session_state():
     if 'conversation_history' not in st.session_state:
         st.session_state.conversation_history = []
 
+    if 'responses' not in st.session_state:
+        st.session_state.responses = OrderedDict()
+
     if 'agui_messages' not in st.session_state:
         st.session_state.agui_messages = []
 
@@ -113,96 +116,216 @@ def init_session_state():
         st.session_state.processing = False
 
 
-def initialize_orchestrator():
-    """Initialize the Apothecary orchestrator"""
-    if st.session_state.orchestrator is None:
-        with st.spinner("Initializing Apothecary-AI system..."):
+@st.cache_resource(show_spinner="Initializing Apothecary-AI system...")
+def _get_orchestrator() -> ApothecaryOrchestrator:
+    """
+    Orchestrator shared by all sessions and reruns of this process.
+
+    run() and run_action() give every request its own AG-UI handler, so
+    concurrent sessions never share result lists. The AG-UI callback is
+    registered once, here, and forwarded to those handlers: st.session_state
+    resolves to the session whose script run emits the message, so each
+    session collects only its own messages.
+    """
+    orchestrator = ApothecaryOrchestrator(enable_agui=True)
+
+    # Register callback to collect AG-UI messages
+    def collect_message(message):
+        st.session_state.agui_messages.append(message)
+        if isinstance(message, StatusUpdate):
+            _flush_status_stream()
+
+    orchestrator.agui.register_callback(collect_message)
+    return orchestrator
+
+
+REQUIRED_DATA_FILES = [
+    Path("data/raw/patients/prescription_history.csv"),
+    Path("data/raw/inventory/current_stock.csv"),
+    Path("data/raw/medications/medication_database.csv")
+]
+
+
+def _missing_data_files(paths: List[Path]) -> List[Path]:
+    """Paths that do not exist, listing each parent directory once"""
+    present = {}
+    missing = []
+    for path in paths:
+        names = present.get(path.parent)
+        if names is None:
             try:
-                # Check if data files exist
-                data_files = [
-                    Path("data/raw/patients/prescription_history.csv"),
-                    Path("data/raw/inventory/current_stock.csv"),
-                    Path("data/raw/medications/medication_database.csv")
-                ]
-
-                missing_files = [f for f in data_files if not f.exists()]
-
-                if missing_files:
-                    st.error("❌ Missing required data files:")
-                    for f in missing_files:
-                        st.error(f"   • {f}")
-                    st.info("💡 Please ensure data files are in the correct location")
-                    st.stop()
-
-                # Check for API key
-                import os
-                if not os.getenv("GOOGLE_API_KEY"):
-                    st.warning("⚠️ GOOGLE_API_KEY not found in environment")
-                    st.info("💡 Create a `.env` file with: GOOGLE_API_KEY=your_key_here")
-                    st.info("💡 Or the system will use simulation mode for EODY reports")
-
-                # Initialize orchestrator
-                orchestrator = ApothecaryOrchestrator(enable_agui=True)
-
-                # Register callback to collect AG-UI messages
-                def collect_message(message):
-                    st.session_state.agui_messages.append(message)
-
-                orchestrator.agui.register_callback(collect_message)
-                st.session_state.orchestrator = orchestrator
+                with os.scandir(path.parent) as entries:
+                    names = {entry.name for entry in entries}
+            except (FileNotFoundError, NotADirectoryError):
+                names = set()
+            present[path.parent] = names
+        if path.name not in names:
+            missing.append(path)
+    return missing
 
-            except Exception as e:
-                import traceback
-                st.error(f"❌ Failed to initialize system: {str(e)}")
-                with st.expander("🔍 View Error Details"):
-                    st.code(traceback.format_exc())
+
+def initialize_orchestrator():
+    """Attach the shared Apothecary orchestrator to this session"""
+    if st.session_state.orchestrator is None:
+        try:
+            # Check if data files exist
+            missing_files = _missing_data_files(REQUIRED_DATA_FILES)
+
+            if missing_files:
+                st.error("❌ Missing required data files:")
+                for f in missing_files:
+                    st.error(f"   • {f}")
+                st.info("💡 Please ensure data files are in the correct location")
                 st.stop()
 
+            # Check for API key
+            if not os.getenv("GOOGLE_API_KEY"):
+                st.warning("⚠️ GOOGLE_API_KEY not found in environment")
+                st.info("💡 Create a `.env` file with: GOOGLE_API_KEY=your_key_here")
+                st.info("💡 Or the system will use simulation mode for EODY reports")
 
-def render_status_update(status: StatusUpdate):
-    """Render a status update message"""
-    status_icons = {
-        AgentStatus.STARTING: "🔄",
-        AgentStatus.WORKING: "⚙️",
-        AgentStatus.COMPLETED: "✅",
-        AgentStatus.FAILED: "❌"
-    }
+            st.session_state.orchestrator = _get_orchestrator()
+
+        except Exception as e:
+            st.error(f"❌ Failed to initialize system: {str(e)}")
+            with st.expander("🔍 View Error Details"):
+                st.code(traceback.format_exc())
+            st.stop()
+
+
+_STATUS_ICONS = {
+    AgentStatus.STARTING: "🔄",
+    AgentStatus.WORKING: "⚙️",
+    AgentStatus.COMPLETED: "✅",
+    AgentStatus.FAILED: "❌"
+}
 
-    icon = status_icons.get(status.status, "•")
 
-    st.markdown(f"""
+def _status_html(status: StatusUpdate) -> str:
+    """HTML for one status update"""
+    icon = _STATUS_ICONS.get(status.status, "•")
+
+    return f"""
     <div class="status-box">
         {icon} <strong>[{status.agent}]</strong> {status.message}
     </div>
-    """, unsafe_allow_html=True)
+    """
+
+
+def render_status_batch(statuses: List[StatusUpdate], container=None):
+    """
+    Render several status updates as one markdown element.
+
+    Args:
+        statuses: Status updates in display order
+        container: Element to draw into (default: the current Streamlit container)
+    """
+    if not statuses:
+        return
+    target = st if container is None else container
+    target.markdown("\n".join(_status_html(status) for status in statuses), unsafe_allow_html=True)
+
+
+def _flush_status_stream():
+    """
+    Redraw the live status placeholder with all status updates so far.
+    No-op outside live_status_stream.
+    """
+    container = st.session_state.get('status_container')
+    if container is None:
+        return
+
+    render_status_batch(
+        [msg for msg in st.session_state.agui_messages if isinstance(msg, StatusUpdate)],
+        container
+    )
 
 
-def render_result_message(result: ResultMessage):
-    """Render a result message"""
+@contextmanager
+def live_status_stream():
+    """
+    Stream AG-UI status updates into one placeholder while a query runs.
+    The placeholder is emptied afterwards; the history shows the messages.
+    """
+    st.session_state.status_container = st.empty()
+    try:
+        yield
+    finally:
+        st.session_state.status_container.empty()
+        st.session_state.status_container = None
+
+
+@lru_cache(maxsize=512)
+def _result_html(agent: str, summary: str, reasoning: Optional[str]) -> str:
+    """HTML for a regular result box (cached; history re-renders the same results every run)"""
+    return f"""
+    <div class="result-box">
+        <strong>✓ {agent} completed:</strong><br>
+        {summary}
+        {f'<br><em>→ {reasoning}</em>' if reasoning else ''}
+    </div>
+    """
+
+
+def _details_json(result: ResultMessage) -> Optional[str]:
+    """Pretty-printed JSON of the details a result box shows, or None if there are none"""
+    if not result.details or "formatted_response" in result.details:
+        return None
+    return orjson.dumps(
+        result.details,
+        option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        default=str
+    ).decode()
+
+
+def render_result_message(
+    result: ResultMessage,
+    details_expander: bool = True,
+    details_json: Optional[str] = None
+):
+    """
+    Render a result message.
+
+    Args:
+        result: Result to render
+        details_expander: Show details in an expander; pass False inside
+            another expander (Streamlit does not allow nesting them)
+        details_json: Details precomputed by _details_json, shown inline
+            as a JSON code block instead of being serialized again
+    """
     # Check if this is a formatted response (markdown)
     if result.details and "formatted_response" in result.details:
         # Render formatted markdown response
         st.markdown(result.details["formatted_response"])
-    else:
-        # Regular result box
-        st.markdown(f"""
-        <div class="result-box">
-            <strong>✓ {result.agent} completed:</strong><br>
-            {result.summary}
-            {f'<br><em>→ {result.reasoning}</em>' if result.reasoning else ''}
-        </div>
-        """, unsafe_allow_html=True)
-
-        # Show details in expander (skip formatted_response key)
-        if result.details:
-            details_to_show = {k: v for k, v in result.details.items() if k != "formatted_response"}
-            if details_to_show:
+        return
+
+    # Regular result box
+    st.markdown(_result_html(result.agent, result.summary, result.reasoning), unsafe_allow_html=True)
+
+    if details_json is not None:
+        st.code(details_json, language="json")
+        return
+
+    # Show details (skip formatted_response key)
+    if result.details:
+        details_to_show = {k: v for k, v in result.details.items() if k != "formatted_response"}
+        if details_to_show:
+            if details_expander:
                 with st.expander("📊 View Details"):
                     st.json(details_to_show)
+            else:
+                st.json(details_to_show)
+
 
+def render_suggestions(suggestions: SuggestionsMessage, conv_idx: int):
+    """
+    Render suggested actions as clickable buttons.
 
-def render_suggestions(suggestions: SuggestionsMessage):
-    """Render suggested actions as clickable buttons"""
+    Args:
+        suggestions: Actions to offer
+        conv_idx: Index of the conversation in the history; keeps the
+            button keys stable across reruns
+    """
     st.markdown("### 📋 Suggested Next Actions")
     st.markdown("Click a button to execute the suggested action:")
 
@@ -212,7 +335,7 @@ def render_suggestions(suggestions: SuggestionsMessage):
         with cols[i]:
             if st.button(
                 action.label,
-                key=f"suggestion_{action.id}_{datetime.now().timestamp()}",
+                key=f"sugg_{conv_idx}_{action.id}",
                 use_container_width=True,
                 type="secondary"
             ):
@@ -223,8 +346,8 @@ def render_suggestions(suggestions: SuggestionsMessage):
             st.caption(action.description)
 
 
-def render_final_response(response: FinalResponse):
-    """Render the final response"""
+def render_final_response(response: FinalResponse, conv_idx: int):
+    """Render the final response (conv_idx: its index in the conversation history)"""
     # Show all results
     for result in response.results:
         render_result_message(result)
@@ -236,21 +359,25 @@ def render_final_response(response: FinalResponse):
             # Patient analysis visualization
             if 'total_profiles' in details and 'behavior_breakdown' in details:
                 with st.expander("📊 Patient Analysis Visualization", expanded=True):
+                    from src.streamlit_components.charts import render_patient_analysis_chart
                     render_patient_analysis_chart(details)
 
             # Forecast visualization
             elif 'total_demand' in details and 'total_medications' in details:
                 with st.expander("📈 Forecast Visualization", expanded=True):
+                    from src.streamlit_components.charts import render_forecast_chart
                     render_forecast_chart(details)
 
             # Optimization visualization
             elif 'optimization' in details:
                 with st.expander("🎯 Optimization Summary", expanded=True):
+                    from src.streamlit_components.charts import render_optimization_summary
                     render_optimization_summary(details)
 
             # Category breakdown
             elif 'category' in details and 'medications' in details:
                 with st.expander("📦 Category Breakdown", expanded=True):
+                    from src.streamlit_components.charts import render_category_breakdown
                     render_category_breakdown(details)
 
     # Summary (skip generic messages)
@@ -264,10 +391,27 @@ def render_final_response(response: FinalResponse):
     # Suggestions
     if response.suggestions:
         st.markdown("---")
-        render_suggestions(response.suggestions)
+        render_suggestions(response.suggestions, conv_idx)
         st.session_state.current_suggestions = response.suggestions
 
 
+# Quick action label -> query it runs
+QUICK_ACTIONS = {
+    "📊 Check Inventory": "Show current inventory status",
+    "👥 Patient Analysis": "Analyze patient refill patterns",
+    "📈 Forecast Demand": "Forecast medication demand for next 30 days",
+    "🎯 Complete Analysis": "Run complete inventory analysis and generate order recommendations"
+}
+
+
+def _queue_quick_action():
+    """Queue the chosen quick action and reset the selector so it fires once"""
+    choice = st.session_state.quick_choice
+    if choice is not None:
+        st.session_state.quick_query = QUICK_ACTIONS[choice]
+        st.session_state.quick_choice = None
+
+
 def render_sidebar():
     """Render the sidebar"""
     with st.sidebar:
@@ -278,17 +422,14 @@ def render_sidebar():
         # Quick actions
         st.markdown("### 🎯 Quick Actions")
 
-        if st.button("📊 Check Inventory", use_container_width=True):
-            st.session_state.quick_query = "Show current inventory status"
-
-        if st.button("👥 Patient Analysis", use_container_width=True):
-            st.session_state.quick_query = "Analyze patient refill patterns"
-
-        if st.button("📈 Forecast Demand", use_container_width=True):
-            st.session_state.quick_query = "Forecast medication demand for next 30 days"
-
-        if st.button("🎯 Complete Analysis", use_container_width=True):
-            st.session_state.quick_query = "Run complete inventory analysis and generate order recommendations"
+        st.radio(
+            "Quick actions",
+            list(QUICK_ACTIONS),
+            index=None,
+            key="quick_choice",
+            on_change=_queue_quick_action,
+            label_visibility="collapsed"
+        )
 
         st.markdown("---")
 
@@ -312,55 +453,74 @@ def render_sidebar():
         # Clear history
         if st.button("🗑️ Clear History", use_container_width=True):
             st.session_state.conversation_history = []
+            st.session_state.responses = OrderedDict()
             st.session_state.agui_messages = []
             st.session_state.current_suggestions = None
+            from src.streamlit_components.charts import clear_inventory_cache
+            clear_inventory_cache()
             st.rerun()
 
 
+# Conversations shown in the history; responses beyond these are dropped
+HISTORY_DISPLAY_LIMIT = 5
+
+
+def record_conversation(query: str, response):
+    """
+    Add a conversation to the history.
+
+    The entry keeps only metadata and a response id; the response itself
+    goes to st.session_state.responses, which holds the latest
+    HISTORY_DISPLAY_LIMIT responses together with the JSON of each
+    result's details, serialized once here rather than on every rerun.
+    """
+    response_id = uuid4().hex
+    details_json = (
+        tuple(_details_json(result) for result in response.results)
+        if isinstance(response, FinalResponse) else ()
+    )
+    responses = st.session_state.responses
+    responses[response_id] = (response, details_json)
+    while len(responses) > HISTORY_DISPLAY_LIMIT:
+        responses.popitem(last=False)
+
+    st.session_state.conversation_history.append({
+        "query": query,
+        "timestamp": datetime.now().isoformat(),
+        "messages": st.session_state.agui_messages.copy(),
+        "response_id": response_id
+    })
+
+
 def render_conversation_history():
     """Render conversation history"""
     if st.session_state.conversation_history:
         st.markdown("### 📜 Conversation History")
 
-        for i, conv in enumerate(reversed(st.session_state.conversation_history[-5:])):
-            is_latest = (i == 0)
+        # Newest first, indexing into the history instead of slicing it
+        history = st.session_state.conversation_history
+        n = len(history)
+        for conv_idx in range(n - 1, max(n - HISTORY_DISPLAY_LIMIT, 0) - 1, -1):
+            conv = history[conv_idx]
+            is_latest = (conv_idx == n - 1)
             with st.expander(f"🔍 {conv['query'][:50]}... ({conv['timestamp'][:19]})", expanded=is_latest):
                 st.markdown(f"**Query:** {conv['query']}")
 
                 # Render AG-UI messages
                 if 'messages' in conv and conv['messages']:
                     st.markdown("---")
-                    for msg in conv['messages']:
-                        if isinstance(msg, StatusUpdate):
-                            render_status_update(msg)
+                    render_status_batch([msg for msg in conv['messages'] if isinstance(msg, StatusUpdate)])
 
                 # Render response (flattened, no nested expanders)
-                if 'response' in conv:
+                stored = st.session_state.responses.get(conv.get('response_id'))
+                if stored is not None:
+                    response, details_json = stored
                     st.markdown("---")
-                    if isinstance(conv['response'], FinalResponse):
-                        response = conv['response']
+                    if isinstance(response, FinalResponse):
 
                         # Show all results inline (no expanders)
-                        for result in response.results:
-                            # Check if this is a formatted response (markdown)
-                            if result.details and "formatted_response" in result.details:
-                                # Render formatted markdown response
-                                st.markdown(result.details["formatted_response"])
-                            else:
-                                # Regular result box
-                                st.markdown(f"""
-                                <div class="result-box">
-                                    <strong>✓ {result.agent} completed:</strong><br>
-                                    {result.summary}
-                                    {f'<br><em>→ {result.reasoning}</em>' if result.reasoning else ''}
-                                </div>
-                                """, unsafe_allow_html=True)
-
-                                # Show details as JSON inline (skip formatted_response key)
-                                if result.details:
-                                    details_to_show = {k: v for k, v in result.details.items() if k != "formatted_response"}
-                                    if details_to_show:
-                                        st.json(details_to_show)
+                        for result, result_json in zip(response.results, details_json):
+                            render_result_message(result, details_expander=False, details_json=result_json)
 
                         # Summary (skip generic messages)
                         generic_summaries = ["Query completed successfully", "Analysis completed successfully"]
@@ -373,15 +533,63 @@ def render_conversation_history():
                         # Suggestions (if any)
                         if response.suggestions:
                             st.markdown("---")
-                            render_suggestions(response.suggestions)
+                            render_suggestions(response.suggestions, conv_idx)
                     else:
-                        st.write(conv['response'])
+                        st.write(response)
+
+
+@st.fragment
+def render_query_input():
+    """
+    Render the query box and handle submissions.
+
+    Runs as a fragment, so interacting with the input reruns only this
+    block; the full app reruns once a query has been answered.
+    """
+    st.markdown("### 💬 Ask Apothecary-AI")
+
+    # Text input for user query
+    query = st.text_input(
+        "Enter your query:",
+        placeholder="e.g., What's the current inventory of Metformin?",
+        key="query_input"
+    )
+
+    col1, col2 = st.columns([1, 5])
+    with col1:
+        submit_button = st.button("🚀 Submit", type="primary", use_container_width=True)
+
+    # Process query when button is clicked
+    if submit_button:
+        if query and query.strip():
+            st.session_state.agui_messages = []
+
+            try:
+                with st.spinner(f"🔄 Processing query: {query[:50]}..."), live_status_stream():
+                    response = st.session_state.orchestrator.run(query.strip())
+
+                    # Add to conversation history
+                    record_conversation(query.strip(), response)
+
+                    # Rerun the whole app so the history shows the new entry
+                    st.rerun(scope="app")
+
+            except Exception as e:
+                st.error(f"❌ Error occurred: {str(e)}")
+                with st.expander("🔍 View Full Error Details"):
+                    st.code(traceback.format_exc())
+        else:
+            st.warning("⚠️ Please enter a query first!")
 
 
 def main():
     """Main application"""
     init_session_state()
 
+    # Streamlit clears elements not re-emitted in a run, so the styles are
+    # sent every run rather than once per session
+    st.markdown(_CSS, unsafe_allow_html=True)
+
     # Header
     st.markdown('<div class="main-header">🧪 Apothecary-AI Dashboard</div>', unsafe_allow_html=True)
     st.markdown('<div class="sub-header">AI-Powered Pharmacy Inventory Management System</div>', unsafe_allow_html=True)
@@ -401,23 +609,15 @@ def main():
         st.session_state.agui_messages = []
 
         try:
-            with st.spinner(f"🔄 Executing: {action.label}..."):
+            with st.spinner(f"🔄 Executing: {action.label}..."), live_status_stream():
                 # Route the action
                 if st.session_state.orchestrator.action_router:
-                    result = asyncio.run(
-                        st.session_state.orchestrator.action_router.route_action(action)
-                    )
+                    result = st.session_state.orchestrator.run_action(action)
 
                     # Add to conversation history
-                    st.session_state.conversation_history.append({
-                        "query": f"[Suggested Action] {action.label}",
-                        "timestamp": datetime.now().isoformat(),
-                        "messages": st.session_state.agui_messages.copy(),
-                        "response": result
-                    })
+                    record_conversation(f"[Suggested Action] {action.label}", result)
 
         except Exception as e:
-            import traceback
             st.error(f"❌ Error executing action: {str(e)}")
             with st.expander("🔍 View Error Details"):
                 st.code(traceback.format_exc())
@@ -435,66 +635,22 @@ def main():
                 with st.spinner(f"🔄 Loading inventory..."):
                     # Just render the chart directly, no need to process through orchestrator
                     st.markdown("---")
+                    from src.streamlit_components.charts import render_inventory_overview_with_chart
                     render_inventory_overview_with_chart()
             else:
-                with st.spinner(f"🔄 Processing query: {default_query[:50]}..."):
+                with st.spinner(f"🔄 Processing query: {default_query[:50]}..."), live_status_stream():
                     response = st.session_state.orchestrator.run(default_query)
 
                     # Add to conversation history
-                    st.session_state.conversation_history.append({
-                        "query": default_query,
-                        "timestamp": datetime.now().isoformat(),
-                        "messages": st.session_state.agui_messages.copy(),
-                        "response": response
-                    })
+                    record_conversation(default_query, response)
 
         except Exception as e:
-            import traceback
             st.error(f"❌ Error occurred: {str(e)}")
             with st.expander("🔍 View Full Error Details"):
                 st.code(traceback.format_exc())
 
     # Main query input
-    st.markdown("### 💬 Ask Apothecary-AI")
-
-    # Text input for user query
-    query = st.text_input(
-        "Enter your query:",
-        placeholder="e.g., What's the current inventory of Metformin?",
-        key="query_input"
-    )
-
-    col1, col2 = st.columns([1, 5])
-    with col1:
-        submit_button = st.button("🚀 Submit", type="primary", use_container_width=True)
-
-    # Process query when button is clicked
-    if submit_button:
-        if query and query.strip():
-            st.session_state.agui_messages = []
-
-            try:
-                with st.spinner(f"🔄 Processing query: {query[:50]}..."):
-                    response = st.session_state.orchestrator.run(query.strip())
-
-                    # Add to conversation history
-                    st.session_state.conversation_history.append({
-                        "query": query.strip(),
-                        "timestamp": datetime.now().isoformat(),
-                        "messages": st.session_state.agui_messages.copy(),
-                        "response": response
-                    })
-
-                    # Force rerun to show in history
-                    st.rerun()
-
-            except Exception as e:
-                import traceback
-                st.error(f"❌ Error occurred: {str(e)}")
-                with st.expander("🔍 View Full Error Details"):
-                    st.code(traceback.format_exc())
-        else:
-            st.warning("⚠️ Please enter a query first!")
+    render_query_input()
 
     # Show conversation history
     if st.session_state.conversation_history:
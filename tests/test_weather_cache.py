@@ -0,0 +1,35 @@
+"""
+Tests for the OpenWeather disk cache pruning.
+"""
+
+from src.services.weather_api import _cache_path, _state_path, _write_disk_cache
+
+
+def _names(cache_dir):
+    return sorted(path.name for path in cache_dir.iterdir())
+
+
+def test_prune_keeps_overlapping_locations(tmp_path):
+    """Writing "New" must not touch "New_York" cache or state files."""
+    for location in ("New", "New_York"):
+        _write_disk_cache(_cache_path(tmp_path, location, 100), {"temp": 10})
+        _state_path(tmp_path, location).write_text("{}")
+
+    _write_disk_cache(_cache_path(tmp_path, "New", 101), {"temp": 11})
+
+    assert _names(tmp_path) == [
+        "New.last_temp.json",
+        "New_101.json",
+        "New_York.last_temp.json",
+        "New_York_100.json",
+    ]
+
+
+def test_prune_treats_location_literally(tmp_path):
+    """Glob metacharacters in a location name are not wildcards."""
+    _write_disk_cache(_cache_path(tmp_path, "A", 100), {"temp": 10})
+    _write_disk_cache(_cache_path(tmp_path, "[A]", 100), {"temp": 10})
+
+    _write_disk_cache(_cache_path(tmp_path, "[A]", 101), {"temp": 11})
+
+    assert _names(tmp_path) == ["A_100.json", "[A]_101.json"]